@@ -1,12 +1,15 @@
 import pandas as pd
 import os
-import re
 import json
 import argparse
 
+from etl_mapping import ColumnMapper
+from etl_output import compressions, parse_formats, write_table
+
 # Configuration
 result_path_csv = "./Résultat de l'ETL/final.csv"
-result_path_json = "./Résultat de l'ETL/final.json"
+result_formats = ("csv", "json")
+visual_path_csv = "./Résultat de l'ETL/visual.csv"
 
 # Synonymes possibles pour des colonnes hétérogènes (plus large)
 standard_column_map = {
@@ -19,6 +22,7 @@ standard_column_map = {
     "new_cases": ["new_cases", "Daily confirmed", "NewCases", "daily_confirmed", "cases_new", "confirmed_today"],
     "new_deaths": ["new_deaths", "Daily deaths", "NewDeaths", "daily_deaths", "new_deaths_smoothed", "deaths_today"]
 }
+column_mapper = ColumnMapper(standard_column_map)
 
 indicator_mapping = {
     "confirmed": {"indicator": "confirmed", "unit": "cases"},
@@ -29,32 +33,26 @@ indicator_mapping = {
     "new_deaths": {"indicator": "new_deaths", "unit": "deaths"}
 }
 
+indicators = list(indicator_mapping)
+unit_by_indicator = {k: v["unit"] for k, v in indicator_mapping.items()}
+units = list(dict.fromkeys(unit_by_indicator.values()))
+# code de catégorie d'indicateur → code de catégorie d'unité
+unit_codes = {i: units.index(unit_by_indicator[ind]) for i, ind in enumerate(indicators)}
+visual_keys = ["date", "country", "pandemic"]
+
 def extract(file_path):
     if file_path.endswith(".json"):
         return pd.read_json(file_path)
     else:
         return pd.read_csv(file_path)
 
-def normalize_column_name(col):
-    return re.sub(r"[^a-z0-9]+", "_", col.strip().lower())
-
 def apply_flexible_mapping(df):
-    mapping = {}
-    normalized_cols = {normalize_column_name(col): col for col in df.columns}
-    unmatched = set(df.columns)
-
-    for standard, candidates in standard_column_map.items():
-        for candidate in candidates:
-            norm_candidate = normalize_column_name(candidate)
-            if norm_candidate in normalized_cols:
-                mapping[normalized_cols[norm_candidate]] = standard
-                unmatched.discard(normalized_cols[norm_candidate])
-                break
+    df, unmatched = column_mapper.rename(df)
 
     if unmatched:
-        print("🔎 Colonnes non reconnues :", list(unmatched))
+        print("🔎 Colonnes non reconnues :", unmatched)
 
-    return df.rename(columns=mapping)
+    return df
 
 def transform(df, pandemic_name):
     df = apply_flexible_mapping(df)
@@ -75,27 +73,61 @@ def transform(df, pandemic_name):
 
     df_long = df.melt(
         id_vars=["country", "date", "pandemic"],
-        value_vars=["confirmed", "deaths", "recovered", "active", "new_cases", "new_deaths"],
+        value_vars=indicators,
         var_name="indicator",
         value_name="value"
     )
 
-    df_long["unit"] = df_long["indicator"].map(lambda x: indicator_mapping.get(x, {}).get("unit", "unknown"))
+    # indicator/unit en catégories : l'unité est résolue une fois par indicateur, pas par ligne
+    df_long["indicator"] = pd.Categorical(df_long["indicator"], categories=indicators)
+    df_long["unit"] = pd.Categorical.from_codes(
+        df_long["indicator"].cat.codes.map(unit_codes), categories=units
+    )
     df_long = df_long.dropna(subset=["value", "date"])
     return df_long
 
-def run_etl(file_path, pandemic_name):
+def to_visual(df_long):
+    """Format large pour Power BI (1 ligne = date + pays + pandémie, 1 colonne par indicateur).
+
+    Remplace le pivot_table(aggfunc="first") : premier doublon conservé puis
+    unstack aligné sur l'index, sans agrégation.
+    """
+    wide = (
+        df_long.dropna(subset=visual_keys)
+        .drop_duplicates(visual_keys + ["indicator"])
+        .set_index(visual_keys + ["indicator"])["value"]
+        .unstack("indicator")
+        .dropna(axis=1, how="all")
+    )
+    wide.columns = wide.columns.astype(str)
+    wide = wide[sorted(wide.columns)].reset_index()
+    wide.columns.name = None
+
+    # Valeurs manquantes → 0 par défaut pour une visualisation complète
+    return wide.fillna(0)
+
+def save_visual(df_long, path=None):
+    path = path or visual_path_csv
+    visual = to_visual(df_long)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    visual.to_csv(path, index=False)
+    print("✅ Fichier visual.csv généré avec succès dans :", path)
+    return visual
+
+def run_etl(file_path, pandemic_name, formats=None, compression=None):
     print(f"\n📄 Traitement du fichier : {file_path}")
     try:
         df_raw = extract(file_path)
         print("Colonnes d'origine :", df_raw.columns.tolist())
         df_clean = transform(df_raw, pandemic_name)
-        os.makedirs(os.path.dirname(result_path_csv), exist_ok=True)
-        df_clean.to_csv(result_path_csv, index=False)
-        df_clean.to_json(result_path_json, orient="records", date_format="iso")
-        print("\n✅ Fichier final CSV sauvegardé dans :", result_path_csv)
-        print("✅ Fichier final JSON sauvegardé dans :", result_path_json)
+        # CSV et JSON écrits en parallèle, JSON sérialisé par blocs
+        base_path = os.path.splitext(result_path_csv)[0]
+        for path in write_table(df_clean, base_path, formats or result_formats, compression):
+            print("✅ Fichier final sauvegardé dans :", path)
         print(df_clean.head())
+
+        # Table Power BI produite depuis le même DataFrame (plus de relecture de final.csv)
+        save_visual(df_clean)
     except Exception as e:
         print(f"❌ Erreur lors du traitement de {file_path} : {e}")
 
@@ -103,6 +135,10 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="ETL Pandémie")
     parser.add_argument("--file", type=str, help="Chemin du fichier à traiter")
     parser.add_argument("--pandemic_name", type=str, help="Nom de la pandémie", default="pandemic")
+    parser.add_argument("--formats", type=parse_formats, default=result_formats,
+                        help="Formats de final, séparés par des virgules : csv, json, ndjson (défaut : csv,json)")
+    parser.add_argument("--compression", choices=[c for c in compressions if c], default=None,
+                        help="Compression des fichiers final (zstd nécessite zstandard)")
     args = parser.parse_args()
 
     # Mode test manuel local si aucun argument fourni
@@ -110,6 +146,6 @@ if __name__ == "__main__":
         print("⚠️ Aucune entrée fournie. Passage en mode TEST LOCAL...")
         test_file = "./DATASETS/owid-monkeypox-data.csv"
         test_name = "Monkeypox Test"
-        run_etl(test_file, test_name)
+        run_etl(test_file, test_name, args.formats, args.compression)
     else:
-        run_etl(args.file, args.pandemic_name)
+        run_etl(args.file, args.pandemic_name, args.formats, args.compression)
@@ -1,11 +1,17 @@
 import pandas as pd
+import numpy as np
 import os
-import re
+import glob
 import json
 import argparse
 
+from etl_mapping import ColumnMapper, detect_maladie
+from etl_output import appendable, compressions, output_formats, parse_formats, write_table
+
 # Configuration
 result_folder = "./Résultat de l'ETL"
+table_formats = ("csv", "json")
+table_compression = None
 os.makedirs(result_folder, exist_ok=True)
 
 # Synonymes possibles pour des colonnes hétérogènes
@@ -19,6 +25,9 @@ standard_column_map = {
     "new_cases": ["new_cases", "Daily confirmed", "NewCases", "daily_confirmed", "cases_new", "confirmed_today"],
     "new_deaths": ["new_deaths", "Daily deaths", "NewDeaths", "daily_deaths", "new_deaths_smoothed", "deaths_today"]
 }
+column_mapper = ColumnMapper(standard_column_map)
+input_extensions = (".csv", ".json")
+keymap_file = "keymap.json"
 
 def extract(file_path):
     if file_path.endswith(".json"):
@@ -26,26 +35,13 @@ def extract(file_path):
     else:
         return pd.read_csv(file_path)
 
-def normalize_column_name(col):
-    return re.sub(r"[^a-z0-9]+", "_", col.strip().lower())
-
 def apply_flexible_mapping(df):
-    mapping = {}
-    normalized_cols = {normalize_column_name(col): col for col in df.columns}
-    unmatched = set(df.columns)
-
-    for standard, candidates in standard_column_map.items():
-        for candidate in candidates:
-            norm_candidate = normalize_column_name(candidate)
-            if norm_candidate in normalized_cols:
-                mapping[normalized_cols[norm_candidate]] = standard
-                unmatched.discard(normalized_cols[norm_candidate])
-                break
+    df, unmatched = column_mapper.rename(df)
 
     if unmatched:
-        print("🔎 Colonnes non reconnues :", list(unmatched))
+        print("🔎 Colonnes non reconnues :", unmatched)
 
-    return df.rename(columns=mapping)
+    return df
 
 def transform(df, pandemic_name):
     df = apply_flexible_mapping(df)
@@ -71,41 +67,160 @@ def transform(df, pandemic_name):
     return df[["country", "date", "confirmed", "deaths", "recovered", "active", "new_cases", "new_deaths", "pandemic"]]
 
 
-def create_tables(df, pandemic_name):
-    countries = df[["country"]].drop_duplicates().reset_index(drop=True)
-    countries["id_pays"] = countries.index + 1
+class KeyRegistry:
+    """Clés techniques (pays, maladie) attribuées en mémoire.
+
+    Partagée entre les fichiers d'un batch et persistée dans keymap.json
+    (dossier de résultats) : un même pays garde le même id d'un fichier et
+    d'un run à l'autre, sans relire les tables déjà écrites.
+    """
+
+    def __init__(self, ids=None):
+        self.ids = {"pays": {}, "maladie": {}}
+        for table, mapping in (ids or {}).items():
+            self.ids[table].update(mapping)
+
+    @classmethod
+    def load(cls, path=None):
+        path = path or os.path.join(result_folder, keymap_file)
+        if not os.path.exists(path):
+            return cls()
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def save(self, path=None):
+        path = path or os.path.join(result_folder, keymap_file)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.ids, f, indent=2, ensure_ascii=False)
+
+    def register(self, table, names):
+        """Ids de `names` (Series) : factorize puis une seule recherche par valeur distincte."""
+        ids = self.ids[table]
+        codes, uniques = pd.factorize(names)
+        for name in uniques:
+            ids.setdefault(name, len(ids) + 1)
+        keys = np.fromiter((ids[name] for name in uniques), dtype="int64", count=len(uniques))
+        return pd.Series(keys[codes], index=names.index, name=f"id_{table}")
+
+    def tables(self):
+        countries = pd.DataFrame(list(self.ids["pays"].items()), columns=["country", "id_pays"])
+        regions = pd.DataFrame({
+            "id_region": countries["id_pays"],
+            "nom_region": countries["country"],
+            "id_pays": countries["id_pays"],
+        })
+        maladie = pd.DataFrame(list(self.ids["maladie"].items()), columns=["nom_maladie", "id_maladie"])
+        return countries, regions, maladie[["id_maladie", "nom_maladie"]]
 
-    regions = countries.copy()
-    regions["id_region"] = regions.index + 1
-    regions["nom_region"] = regions["country"]
-    regions = regions[["id_region", "nom_region", "id_pays"]]
+
+def create_tables(df, pandemic_name, keys=None):
+    keys = keys or KeyRegistry()
+    df = df.dropna(subset=["country"])
+
+    # Une région par pays : id_region partage le tableau de id_pays (pas de merge)
+    id_pays = keys.register("pays", df["country"])
+    id_maladie = keys.register("maladie", pd.Series([pandemic_name])).iloc[0]
+
+    first = ~df["country"].duplicated()
+    countries = pd.DataFrame({"country": df["country"][first], "id_pays": id_pays[first]}).reset_index(drop=True)
+    regions = pd.DataFrame({
+        "id_region": countries["id_pays"],
+        "nom_region": countries["country"],
+        "id_pays": countries["id_pays"],
+    })
 
     maladie = pd.DataFrame({
-        "id_maladie": [1],
+        "id_maladie": [id_maladie],
         "nom_maladie": [pandemic_name]
     })
 
-    df = df.merge(countries, on="country")
-    df = df.merge(regions, left_on=["id_pays", "country"], right_on=["id_pays", "nom_region"])
-
-    df["id_maladie"] = 1   # <<< 🛠️ AJOUT DE CETTE LIGNE
-
-    statistiques = df[["id_maladie", "id_region", "date", "new_deaths", "new_cases", "deaths"]]
+    statistiques = df.assign(id_maladie=id_maladie, id_region=id_pays)
+    statistiques = statistiques[["id_maladie", "id_region", "date", "new_deaths", "new_cases", "deaths"]]
     statistiques = statistiques.rename(columns={
         "deaths": "total_mort",
         "new_deaths": "nouveau_mort",
         "new_cases": "nouveau_cas"
-    })
+    }).reset_index(drop=True)
 
     return countries, regions, maladie, statistiques
 
 
-def save_table(df, name):
-    csv_path = os.path.join(result_folder, f"{name}.csv")
-    json_path = os.path.join(result_folder, f"{name}.json")
-    df.to_csv(csv_path, index=False)
-    df.to_json(json_path, orient="records", date_format="iso")
-    print(f"✅ Table {name} sauvegardée en CSV et JSON.")
+class PartitionWriter:
+    """Statistique partitionnée par maladie/année : <dossier>/Statistique/<maladie>/<année>/.
+
+    Chaque partition contient un fichier par source et par format de
+    `table_formats` (json y devient ndjson, le tableau JSON n'étant pas
+    extensible), écrit par etl_output. Retraiter une source ne réécrit que ses
+    propres fichiers : les lignes des autres sources, écrites par des runs
+    précédents, sont conservées.
+    """
+
+    def __init__(self, folder=None, formats=None, compression=None):
+        self.folder = os.path.join(folder or result_folder, "Statistique")
+        self.formats = appendable(formats or table_formats)
+        if "parquet" in self.formats:
+            raise ValueError("Les partitions sont complétées source par source : parquet n'est pas utilisable ici")
+        self.compression = compression or table_compression
+        self.sources = set()
+        self.partitions = set()
+        self.touched = set()
+
+    def clear_source(self, maladie, source):
+        """Supprime les fichiers d'un run précédent pour `source` (toutes années).
+
+        Seuls les noms exacts <source>.<format>[.gz|.zst] sont visés : une autre
+        source dont le nom commence par "<source>." n'est pas touchée.
+        """
+        names = {
+            f"{source}.{fmt}{suffix}"
+            for fmt in dict.fromkeys(self.formats + appendable(output_formats))
+            for suffix in compressions.values()
+        }
+        for year_folder in glob.glob(os.path.join(glob.escape(os.path.join(self.folder, maladie)), "*")):
+            for name in names:
+                path = os.path.join(year_folder, name)
+                if os.path.isfile(path):
+                    os.remove(path)
+
+    def write(self, statistiques, maladie, source):
+        if (maladie, source) not in self.sources:
+            self.sources.add((maladie, source))
+            self.clear_source(maladie, source)
+
+        written = []
+        for year, part in statistiques.groupby(statistiques["date"].dt.year):
+            path = os.path.join(self.folder, maladie, str(year))
+            base_path = os.path.join(path, source)
+            first = base_path not in self.touched
+            self.touched.add(base_path)
+            self.partitions.add(path)
+            write_table(part, base_path, self.formats, self.compression, append=not first)
+            written.append(path)
+        return written
+
+
+def read_partition(path, file_format="csv"):
+    """Relit une partition (toutes sources confondues, compressées ou non)."""
+    files = sorted(glob.glob(os.path.join(glob.escape(path), f"*.{file_format}*")))
+    if file_format == "ndjson":
+        parts = [pd.read_json(f, lines=True) for f in files]
+    else:
+        parts = [pd.read_csv(f) for f in files]
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+
+
+def list_inputs(source):
+    """Fichiers d'un dossier ou d'un motif glob (ex. "./DATASETS/*.csv")."""
+    if os.path.isdir(source):
+        source = os.path.join(source, "*")
+    return sorted(f for f in glob.glob(source) if f.lower().endswith(input_extensions))
+
+
+def save_table(df, name, formats=None, compression=None):
+    formats = formats or table_formats
+    write_table(df, os.path.join(result_folder, name), formats, compression or table_compression)
+    print(f"✅ Table {name} sauvegardée en {', '.join(f.upper() for f in formats)}.")
 
 def run_etl(file_path, pandemic_name):
     print(f"\n📄 Traitement du fichier : {file_path}")
@@ -113,7 +228,9 @@ def run_etl(file_path, pandemic_name):
         df_raw = extract(file_path)
         print("Colonnes d'origine :", df_raw.columns.tolist())
         df_clean = transform(df_raw, pandemic_name)
-        countries, regions, maladie, statistiques = create_tables(df_clean, pandemic_name)
+        keys = KeyRegistry.load()
+        countries, regions, maladie, statistiques = create_tables(df_clean, pandemic_name, keys)
+        keys.save()
 
         save_table(countries, "Pays")
         save_table(regions, "Region")
@@ -124,13 +241,53 @@ def run_etl(file_path, pandemic_name):
     except Exception as e:
         print(f"❌ Erreur lors du traitement de {file_path} : {e}")
 
+def run_batch(source):
+    """Tous les fichiers de `source` dans un seul processus, maladie détectée par fichier."""
+    files = list_inputs(source)
+    print(f"\n📂 {len(files)} fichier(s) à traiter dans : {source}")
+    keys = KeyRegistry.load()
+    writer = PartitionWriter()
+    nb_rows = 0
+
+    for file_path in files:
+        maladie = detect_maladie(os.path.basename(file_path))
+        if maladie == "Inconnue":
+            print(f"⏭️ Maladie non détectée, ignoré : {file_path}")
+            continue
+        print(f"\n📄 Traitement du fichier : {file_path} ({maladie})")
+        try:
+            df_clean = transform(extract(file_path), maladie)
+            _, _, _, statistiques = create_tables(df_clean, maladie, keys)
+            source = os.path.splitext(os.path.basename(file_path))[0]
+            partitions = writer.write(statistiques, maladie, source)
+            nb_rows += len(statistiques)
+            print(f"✅ {len(statistiques)} lignes ajoutées dans {len(partitions)} partition(s).")
+        except Exception as e:
+            print(f"❌ Erreur lors du traitement de {file_path} : {e}")
+
+    keys.save()
+    countries, regions, maladie = keys.tables()
+    save_table(countries, "Pays")
+    save_table(regions, "Region")
+    save_table(maladie, "Maladie")
+    print(f"\n✅ Batch terminé : {nb_rows} lignes, {len(writer.partitions)} partition(s).")
+    return keys
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="ETL Pandémie vers Base de Données")
     parser.add_argument("--file", type=str, help="Chemin du fichier à traiter")
     parser.add_argument("--pandemic_name", type=str, help="Nom de la pandémie", default="pandemic")
+    parser.add_argument("--input", type=str, help="Mode batch : dossier ou motif glob (maladie détectée par fichier)")
+    parser.add_argument("--formats", type=parse_formats, default=table_formats,
+                        help="Formats des tables, séparés par des virgules : csv, json, ndjson (défaut : csv,json)")
+    parser.add_argument("--compression", choices=[c for c in compressions if c], default=None,
+                        help="Compression des tables écrites (zstd nécessite zstandard)")
     args = parser.parse_args()
+    table_formats, table_compression = args.formats, args.compression
 
-    if not args.file:
+    if args.input:
+        run_batch(args.input)
+    elif not args.file:
         print("⚠️ Aucune entrée fournie. Passage en mode TEST LOCAL...")
         test_file = "./DATASETS/owid-monkeypox-data.csv"
         test_name = "Monkeypox Test"
@@ -1,57 +1,30 @@
 import pandas as pd
 import os
-import re
-import psycopg2
+from db_session import close_pool, get_pool
+from ETL_OMS_OPERATIONNEL import ChunkStream, iter_csv_chunks, upsert_dimension
+from etl_mapping import ColumnMapper, detect_maladie
 
 # Configuration
 datasets_folder = "./DATASETS"
-temp_csv = "temp_statistique.csv"
-
-connection_params = {
-    "dbname": "mspr_etl",
-    "user": "postgres",
-    "password": "P@ssw0rd",
-    "host": "localhost",
-    "port": "5432"
-}
-
-maladies_mapping = {
-    "covid": "COVID-19",
-    "coronavirus": "COVID-19",
-    "covid19": "COVID-19",
-    "monkeypox": "Monkeypox",
-    "mpox": "Monkeypox",
-    "ebola": "Ebola Virus Disease"
-}
 
 standard_columns = ["country", "date", "confirmed", "deaths", "recovered", "active", "new_cases", "new_deaths"]
 
 
-def normalize_column_name(col):
-    return re.sub(r"[^a-z0-9]+", "_", col.strip().lower())
+column_synonyms = {
+    "country": ["country", "location", "region", "Country/Region"],
+    "date": ["date", "observation_date", "report_date"],
+    "confirmed": ["confirmed", "total_cases", "cases"],
+    "deaths": ["deaths", "total_deaths", "fatalities"],
+    "recovered": ["recovered", "total_recoveries", "Recoveries"],
+    "active": ["active", "active_cases"],
+    "new_cases": ["new_cases", "daily_confirmed", "cases_new"],
+    "new_deaths": ["new_deaths", "daily_deaths"]
+}
+column_mapper = ColumnMapper(column_synonyms)
 
 
 def apply_flexible_mapping(df):
-    column_synonyms = {
-        "country": ["country", "location", "region", "Country/Region"],
-        "date": ["date", "observation_date", "report_date"],
-        "confirmed": ["confirmed", "total_cases", "cases"],
-        "deaths": ["deaths", "total_deaths", "fatalities"],
-        "recovered": ["recovered", "total_recoveries", "Recoveries"],
-        "active": ["active", "active_cases"],
-        "new_cases": ["new_cases", "daily_confirmed", "cases_new"],
-        "new_deaths": ["new_deaths", "daily_deaths"]
-    }
-    mapping = {}
-    normalized_cols = {normalize_column_name(col): col for col in df.columns}
-
-    for std_col, synonyms in column_synonyms.items():
-        for syn in synonyms:
-            if normalize_column_name(syn) in normalized_cols:
-                mapping[normalized_cols[normalize_column_name(syn)]] = std_col
-                break
-
-    df = df.rename(columns=mapping)
+    df, _ = column_mapper.rename(df)
     return df
 
 
@@ -59,14 +32,6 @@ def extract(file_path):
     return pd.read_csv(file_path) if file_path.endswith(".csv") else pd.read_json(file_path)
 
 
-def detect_maladie(file_name):
-    name = file_name.lower()
-    for keyword, maladie in maladies_mapping.items():
-        if keyword in name:
-            return maladie
-    return "Inconnue"
-
-
 def complete_missing_columns(df):
     for col in standard_columns:
         if col not in df.columns:
@@ -93,18 +58,13 @@ def transform(df):
     return df
 
 
-def connect_db():
-    return psycopg2.connect(**connection_params)
-
-
 def prepare_temp_csv(all_rows):
     df_temp = pd.DataFrame(all_rows, columns=["id_maladie", "id_region", "date", "nouveau_mort", "nouveau_cas", "total_mort"])
     df_temp = df_temp.drop_duplicates(subset=["id_region", "date"], keep="last")
-    df_temp.to_csv(temp_csv, index=False, header=False)
+    return ChunkStream(iter_csv_chunks(df_temp))
 
 
-def copy_into_temp_statistique():
-    conn = connect_db()
+def copy_into_temp_statistique(stream, conn):
     cur = conn.cursor()
     cur.execute("""
         DROP TABLE IF EXISTS temp_statistique;
@@ -119,11 +79,10 @@ def copy_into_temp_statistique():
     """)
     conn.commit()
 
-    with open(temp_csv, "r") as f:
-        cur.copy_expert("""
-            COPY temp_statistique(id_maladie, id_region, date, nouveau_mort, nouveau_cas, total_mort)
-            FROM STDIN WITH CSV
-        """, f)
+    cur.copy_expert("""
+        COPY temp_statistique(id_maladie, id_region, date, nouveau_mort, nouveau_cas, total_mort)
+        FROM STDIN WITH CSV
+    """, stream)
     conn.commit()
 
     cur.execute("""
@@ -137,11 +96,18 @@ def copy_into_temp_statistique():
     """)
     conn.commit()
     cur.close()
-    conn.close()
 
 
 def run_etl():
-    conn = connect_db()
+    try:
+        with get_pool().connection() as conn:
+            load_datasets(conn)
+    finally:
+        close_pool()
+    print("\n🎉 Tous les fichiers ont été traités et insérés avec succès via COPY et table temporaire!")
+
+
+def load_datasets(conn):
     cur = conn.cursor()
     all_rows = []
 
@@ -154,31 +120,21 @@ def run_etl():
             df_raw = extract(file_path)
             df_clean = transform(df_raw)
 
-            cur.execute("SELECT id_maladie FROM maladie WHERE nom_maladie = %s", (maladie_name,))
-            maladie_record = cur.fetchone()
-            if maladie_record:
-                id_maladie = maladie_record[0]
-            else:
-                cur.execute("INSERT INTO maladie (nom_maladie) VALUES (%s) RETURNING id_maladie", (maladie_name,))
-                id_maladie = cur.fetchone()[0]
+            id_maladie = upsert_dimension(cur, "maladie", "id_maladie", ["nom_maladie"], [(maladie_name,)])[maladie_name]
+
+            # Résolution groupée des pays/régions du fichier (au lieu d'un SELECT + INSERT par ligne)
+            countries = [c for c in pd.unique(df_clean["country"]) if pd.notna(c)]
+            pays_ids = upsert_dimension(cur, "pays", "id_pays", ["nom_pays"], [(c,) for c in countries])
+            region_ids = upsert_dimension(
+                cur, "region", "id_region", ["nom_region", "id_pays"],
+                [(c, pays_ids[c]) for c in countries]
+            )
 
             for _, row in df_clean.iterrows():
                 country_name = row["country"]
-                cur.execute("SELECT id_pays FROM pays WHERE nom_pays = %s", (country_name,))
-                pays_record = cur.fetchone()
-                if pays_record:
-                    id_pays = pays_record[0]
-                else:
-                    cur.execute("INSERT INTO pays (nom_pays) VALUES (%s) RETURNING id_pays", (country_name,))
-                    id_pays = cur.fetchone()[0]
-
-                cur.execute("SELECT id_region FROM region WHERE nom_region = %s", (country_name,))
-                region_record = cur.fetchone()
-                if region_record:
-                    id_region = region_record[0]
-                else:
-                    cur.execute("INSERT INTO region (nom_region, id_pays) VALUES (%s, %s) RETURNING id_region", (country_name, id_pays))
-                    id_region = cur.fetchone()[0]
+                if pd.isna(country_name):
+                    continue
+                id_region = region_ids[country_name]
 
                 nouveau_mort = int(row["new_deaths"]) if not pd.isna(row["new_deaths"]) else 0
                 nouveau_cas = int(row["new_cases"]) if not pd.isna(row["new_cases"]) else 0
@@ -186,15 +142,12 @@ def run_etl():
 
                 all_rows.append((id_maladie, id_region, row["date"], nouveau_mort, nouveau_cas, total_mort))
 
-    prepare_temp_csv(all_rows)
-    copy_into_temp_statistique()
-
-    if os.path.exists(temp_csv):
-        os.remove(temp_csv)
+    conn.commit()
 
+    # Même connexion (empruntée au pool) pour les dimensions et le COPY
+    stream = prepare_temp_csv(all_rows)
+    copy_into_temp_statistique(stream, conn)
     cur.close()
-    conn.close()
-    print("\n🎉 Tous les fichiers ont été traités et insérés avec succès via COPY et table temporaire!")
 
 
 if __name__ == "__main__":
@@ -1,26 +1,40 @@
 import pandas as pd
+import numpy as np
 import os
-import re
 import time
+import struct
+import argparse
 import psycopg2
 import io
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack
+from psycopg2.extras import execute_values
+
+from db_session import close_pool, get_pool
+from etl_manifest import Manifest, changed_keys
+from etl_output import output_formats, write_table
+from etl_mapping import ColumnMapper, detect_maladie, normalize_column_name
+from etl_report import RunReport, activate, active_report, file_context, profiling, stage
+from etl_staging import StagingCache
 
 # Configuration
 datasets_folder = "./DATASETS"
-temp_csv = "temp_statistique.csv"
-connection_params = {
-    "dbname": "bpziqzdsvdgpbxyvg2qg",
-    "user": "uzjzegjp9kw0jmrmjr0s",
-    "password": "7LOGZG8w6D929HCLAEYyKI86SA14Xd",
-    "host": "bpziqzdsvdgpbxyvg2qg-postgresql.services.clever-cloud.com",
-    "port": "50013"
-}
-
-maladies_mapping = {
-    "covid": "COVID-19", "coronavirus": "COVID-19", "covid19": "COVID-19",
-    "monkeypox": "Monkeypox", "mpox": "Monkeypox",
-    "ebola": "Ebola Virus Disease"
-}
+copy_chunk_rows = 50_000  # lignes sérialisées par bloc envoyé au COPY
+copy_formats = ("csv", "binary")
+output_folder = "./.etl_output"  # cible du FileSink (mode hors ligne), hors des résultats versionnés
+region_file_columns = ["id_region", "nom_region", "id_pays", "latitude", "longitude"]
+extract_chunk_rows = 100_000  # lignes lues par bloc en mode --chunksize
+ndjson_extensions = (".ndjson", ".jsonl")
+# Formats de date essayés (mois avant jour, comme l'ancien dayfirst=False)
+date_formats = [
+    "%Y-%m-%d", "%Y/%m/%d", "%m/%d/%Y", "%m/%d/%y", "%d/%m/%Y", "%d-%m-%Y",
+    "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y%m%d"
+]
+date_sample_size = 200
+date_format_cache = {}  # signature d'en-tête → format détecté
+population_files = ["covid_global.csv", "covid_worldometer_data.csv"]  # colonnes pays + population
+pyarrow_available = importlib.util.find_spec("pyarrow") is not None
 
 # Colonnes standard attendues
 standard_columns = [
@@ -28,40 +42,49 @@ standard_columns = [
     "new_cases", "new_deaths", "latitude", "longitude"
 ]
 
-def normalize_column_name(col):
-    return re.sub(r"[^a-z0-9]+", "_", col.strip().lower())
+# Colonnes journalières → cumul dont elles sont la différence (si absentes du fichier)
+daily_sources = {"new_cases": "confirmed", "new_deaths": "deaths"}
+
+# Colonnes de temp_statistique, dans l'ordre du COPY
+temp_statistique_columns = [
+    "id_region", "date", "id_maladie", "nouveau_mort", "nouveau_cas",
+    "total_mort", "total_cas"
+]
+
+# Format binaire PGCOPY : signature + flags + longueur d'extension d'en-tête
+PGCOPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+PGCOPY_TRAILER = struct.pack("!h", -1)
+PG_EPOCH = np.datetime64("2000-01-01", "D")
+INT32_MAX = 2**31 - 1
+
+# Colonnes gardées en mémoire entre la transformation et le chargement
+cache_columns = [
+    "country", "date", "confirmed", "deaths", "new_cases", "new_deaths",
+    "latitude", "longitude"
+]
+
+# Synonymes pour mapper vers nos champs
+column_synonyms = {
+    "country": ["country", "location", "region", "country_region", "province_state", "country/region", "countries", "country name", "nation"],
+    "date": ["date", "observation_date", "report_date"],
+    "confirmed": ["confirmed", "total_cases", "cases"],
+    "deaths": ["deaths", "total_deaths", "fatalities"],
+    "recovered": ["recovered", "total_recoveries", "recoveries"],
+    "active": ["active", "active_cases"],
+    "new_cases": ["new_cases", "daily_confirmed", "cases_new", "new_cases_smoothed"],
+    "new_deaths": ["new_deaths", "daily_deaths", "new_deaths_smoothed"],
+    "latitude": ["lat", "latitude"],
+    "longitude": ["long", "longitude"]
+}
+
+column_mapper = ColumnMapper(column_synonyms)
+
+def resolve_column_mapping(columns):
+    """Renvoie {colonne source: colonne standard} pour une liste de colonnes."""
+    return column_mapper.resolve(columns).mapping
 
 def apply_flexible_mapping(df):
-    # Synonymes pour mapper vers nos champs
-    column_synonyms = {
-        "country": ["country", "location", "region", "country_region", "province_state", "country/region", "countries", "country name", "nation"],
-        "date": ["date", "observation_date", "report_date"],
-        "confirmed": ["confirmed", "total_cases", "cases"],
-        "deaths": ["deaths", "total_deaths", "fatalities"],
-        "recovered": ["recovered", "total_recoveries", "recoveries"],
-        "active": ["active", "active_cases"],
-        "new_cases": ["new_cases", "daily_confirmed", "cases_new", "new_cases_smoothed"],
-        "new_deaths": ["new_deaths", "daily_deaths", "new_deaths_smoothed"],
-        "latitude": ["lat", "latitude"],
-        "longitude": ["long", "longitude"]
-    }
-
-    mapping = {}
-    normalized_cols = {normalize_column_name(c): c for c in df.columns}
-
-    # Normalise les synonymes dès le départ
-    normalized_synonyms = {
-        std_col: [normalize_column_name(syn) for syn in synonyms]
-        for std_col, synonyms in column_synonyms.items()
-    }
-
-    for std_col, synonyms in normalized_synonyms.items():
-        for n in synonyms:
-            if n in normalized_cols:
-                mapping[normalized_cols[n]] = std_col
-                break
-
-    df = df.rename(columns=mapping)
+    df, _ = column_mapper.rename(df)
 
     # 🟠 Correction : vérifier après le renommage !
     if "country" not in df.columns:
@@ -69,22 +92,145 @@ def apply_flexible_mapping(df):
 
     return df
 
-
-def extract(fp):
-    return pd.read_csv(fp) if fp.lower().endswith(".csv") else pd.read_json(fp)
-
-def detect_maladie(fname):
-    n = fname.lower()
-    for k, v in maladies_mapping.items():
-        if k in n:
-            return v
-    return "Inconnue"
-
-def get_population(country_name, cur):
-    """À implémenter : retourner la population de la région/pays depuis la BD"""
-    # Ex : cur.execute("SELECT population FROM region r JOIN pays p ON r.id_pays=p.id_pays WHERE p.nom_pays=%s", (country_name,))
-    #      return cur.fetchone()[0] or None
-    return None
+def is_rate_column(col):
+    return "per_100_000" in col or "per_100k" in col or "per_million" in col
+
+def sniff_columns(fp):
+    """Lit seulement l'en-tête d'un CSV et en déduit `usecols` et `dtype`.
+
+    On ne garde que les colonnes reconnues par le mapping et les colonnes de taux
+    (per_100k / per_million) utilisées par `transform`. Les compteurs restent en
+    float64 (les cumuls dépassent la précision exacte d'un float32), les taux
+    passent en float32, le pays en category. La date n'est pas typée : pyarrow
+    lit nativement les dates ISO, ce qui est bien plus rapide que du texte.
+    """
+    header = pd.read_csv(fp, nrows=0).columns.tolist()
+    mapping = resolve_column_mapping(header)
+    usecols = [c for c in header if c in mapping or is_rate_column(c)]
+    dtype = {}
+    for col in usecols:
+        std_col = mapping.get(col)
+        if std_col == "country":
+            dtype[col] = "category"
+        elif std_col == "date":
+            continue
+        elif std_col is None:
+            dtype[col] = "float32"
+        else:
+            dtype[col] = "float64"
+    return usecols, dtype
+
+def read_csv_pruned(fp, **kwargs):
+    """read_csv limité aux colonnes utiles et typé ; moteur pyarrow si disponible.
+
+    Si une colonne ne respecte pas le type attendu (texte dans un compteur…),
+    on relit sans `dtype` puis on convertit : les valeurs illisibles deviennent
+    NaN et les colonnes gardent le type attendu. En lecture par blocs l'erreur
+    n'apparaîtrait qu'en cours d'itération : seuls les types catégoriels
+    (pays) sont alors imposés.
+    """
+    usecols, dtype = sniff_columns(fp)
+    if not usecols:
+        return pd.read_csv(fp, **kwargs)
+    if "chunksize" in kwargs:
+        dtype = {col: t for col, t in dtype.items() if t == "category"}
+    elif pyarrow_available:
+        kwargs["engine"] = "pyarrow"
+    try:
+        return pd.read_csv(fp, usecols=usecols, dtype=dtype, **kwargs)
+    except (ValueError, TypeError):
+        print(f"⚠️ Types inattendus dans {os.path.basename(fp)} : conversion après lecture.")
+        df = pd.read_csv(fp, usecols=usecols, **kwargs)
+        for col, t in dtype.items():
+            if t == "category":
+                df[col] = df[col].astype("category")
+            else:
+                df[col] = pd.to_numeric(df[col], errors="coerce").astype(t)
+        return df
+
+def extract(fp, prune=True):
+    if fp.lower().endswith(".csv"):
+        return read_csv_pruned(fp) if prune else pd.read_csv(fp)
+    return pd.read_json(fp, lines=fp.lower().endswith(ndjson_extensions))
+
+def extract_chunks(fp, chunksize=None, prune=True):
+    """Lecture en flux par blocs de `chunksize` lignes (CSV et NDJSON).
+
+    Un JSON classique (tableau) ne se découpe pas : il est lu en un seul bloc.
+    """
+    chunksize = chunksize or extract_chunk_rows
+    name = fp.lower()
+    if name.endswith(".csv"):
+        reader = read_csv_pruned(fp, chunksize=chunksize) if prune else pd.read_csv(fp, chunksize=chunksize)
+        with reader:
+            yield from reader
+    elif name.endswith(ndjson_extensions):
+        with pd.read_json(fp, lines=True, chunksize=chunksize) as reader:
+            yield from reader
+    else:
+        yield pd.read_json(fp)
+
+def read_population_file(path):
+    """Population par pays d'un CSV source (ex. covid_global.csv), via le mapping."""
+    header = pd.read_csv(path, nrows=0).columns
+    country_col = next((c for c, std in resolve_column_mapping(header).items() if std == "country"), None)
+    pop_col = next((c for c in header if normalize_column_name(c) == "population"), None)
+    if country_col is None or pop_col is None:
+        return pd.Series(dtype="float64")
+    df = pd.read_csv(path, usecols=[country_col, pop_col])
+    pop = pd.to_numeric(df[pop_col], errors="coerce")
+    pop = pd.Series(pop.to_numpy(), index=df[country_col].to_numpy()).dropna()
+    # Un pays peut revenir plusieurs fois (lignes province, séries datées) :
+    # première population renseignée, pour que combine_first reste possible
+    return pop[~pop.index.duplicated(keep="first")]
+
+def load_population(cur=None):
+    """Charge une fois par run la population par pays/région (Series indexée par nom).
+
+    La colonne region.population de la BD est prioritaire ; les fichiers de
+    `population_files` complètent les pays absents ou sans population.
+    """
+    population = pd.Series(dtype="float64")
+    if cur is not None:
+        try:
+            cur.execute("SAVEPOINT population")
+            cur.execute("SELECT nom_region, population FROM region WHERE population IS NOT NULL")
+            population = pd.Series(dict(cur.fetchall()), dtype="float64")
+            cur.execute("RELEASE SAVEPOINT population")
+        except psycopg2.Error:
+            # Schéma sans colonne population : on se contente des fichiers
+            cur.execute("ROLLBACK TO SAVEPOINT population")
+    for fn in population_files:
+        path = os.path.join(datasets_folder, fn)
+        if os.path.exists(path):
+            population = population.combine_first(read_population_file(path))
+    print(f"👥 Population connue pour {len(population)} pays/régions.")
+    return population
+
+def rates_to_absolute(df, population):
+    """Convertit les colonnes cumulées per_100k / per_million en valeurs absolues.
+
+    Population jointe ligne à ligne sur `country` (fichiers multi-pays) ; les
+    valeurs absolues déjà présentes dans le fichier ne sont jamais écrasées.
+    """
+    if population is None or population.empty or "country" not in df.columns:
+        return df
+    pop = df["country"].map(population).astype("float64")
+    for col in df.columns:
+        if "per_100_000" in col or "per_100k" in col:
+            factor = 100_000
+            target = "deaths" if "excess_deaths" in col else "confirmed"
+        elif "per_million" in col:
+            factor = 1_000_000
+            target = "deaths" if "deaths" in col else "confirmed"
+        else:
+            continue
+        # Seuls les cumuls alimentent confirmed/deaths (pas les new_*/smoothed)
+        if "new_" in col or "smoothed" in col:
+            continue
+        absolute = (pd.to_numeric(df[col], errors="coerce") * pop / factor).round()
+        df[target] = pd.to_numeric(df[target], errors="coerce").fillna(absolute)
+    return df
 
 def complete_missing_columns(df):
     for col in standard_columns:
@@ -92,56 +238,99 @@ def complete_missing_columns(df):
             df[col] = pd.NA
     return df
 
-def transform(df, cur):
-    df = apply_flexible_mapping(df)
+def detect_date_format(values):
+    """Format de `date_formats` qui lit le plus de valeurs de l'échantillon
+    (le premier de la liste en cas d'égalité), ou None si aucun ne convient."""
+    sample = values.dropna().astype(str).head(date_sample_size)
+    best_fmt, best_count = None, 0
+    for fmt in date_formats:
+        count = pd.to_datetime(sample, format=fmt, errors="coerce").notna().sum()
+        if count > best_count:
+            best_fmt, best_count = fmt, count
+        if best_count == len(sample):
+            break
+    return best_fmt
+
+def parse_dates(values, signature=None):
+    """Convertit une colonne de dates avec un format explicite mis en cache.
+
+    Le format est détecté sur un échantillon puis mémorisé par signature
+    d'en-tête ; seules les valeurs illisibles dans ce format repassent par
+    l'inférence lente, sans re-parser toute la colonne.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    first = values.dropna().head(1)
+    if not first.empty and not isinstance(first.iloc[0], str):
+        # Dates déjà typées par le lecteur (ex. datetime.date de pyarrow)
+        return pd.to_datetime(values, errors="coerce")
+
+    if signature is not None and signature in date_format_cache:
+        fmt = date_format_cache[signature]
+    else:
+        fmt = detect_date_format(values)
+        if signature is not None:
+            date_format_cache[signature] = fmt
+    if fmt is None:
+        return pd.to_datetime(values, dayfirst=False, errors="coerce", format="mixed")
+
+    parsed = pd.to_datetime(values, format=fmt, errors="coerce", cache=True)
+    leftovers = parsed.isna() & values.notna()
+    if leftovers.any():
+        parsed[leftovers] = pd.to_datetime(values[leftovers], dayfirst=False, errors="coerce", format="mixed")
+    return parsed
+
+def diff_by_country(df, col, carry=None):
+    """Équivalent de groupby("country")[col].diff() qui reprend, pour la première
+    ligne de chaque pays, la dernière valeur cumulée du bloc précédent (`carry`)."""
+    values = pd.to_numeric(df[col], errors="coerce")
+    prev = values.groupby(df["country"], observed=True).shift()
+    if carry:
+        first = ~df["country"].duplicated()
+        prev = prev.mask(first, df["country"].map(carry).astype("float64"))
+    return (values - prev).fillna(0).astype(int)
+
+def update_carry(df, col, carry):
+    """Mémorise la dernière valeur de `col` par pays pour le bloc suivant."""
+    last = df[df["country"].notna()].drop_duplicates("country", keep="last")
+    carry.update(zip(last["country"], pd.to_numeric(last[col], errors="coerce")))
+
+def daily_columns_to_compute(columns):
+    """Colonnes journalières absentes de l'en-tête (après mapping), à recalculer
+    par différence sur leur cumul. Décidé une fois par fichier, jamais par bloc."""
+    return [col for col in daily_sources if col not in columns]
+
+def transform(df, population=None, carry=None, recompute=None):
+    signature = tuple(df.columns)
+    with stage("mapping", rows_in=len(df)) as st:
+        df = apply_flexible_mapping(df)
+        st["rows_out"] = len(df)
     print(f"👉 Colonnes après mapping : {df.columns.tolist()}")
+    if recompute is None:
+        recompute = daily_columns_to_compute(df.columns)
     df = complete_missing_columns(df)
 
-    # 🗓️ Conversion robuste des dates
-    try:
-        # On tente d'abord le format ISO explicite
-        df["date"] = pd.to_datetime(df["date"], format="%Y-%m-%d", errors="raise")
-    except Exception:
-        # Sinon fallback plus souple avec dayfirst désactivé
-        df["date"] = pd.to_datetime(df["date"], dayfirst=False, errors="coerce")
+    # 🗓️ Conversion robuste des dates (format détecté une fois par en-tête)
+    with stage("date_parse", rows_in=len(df)) as st:
+        df["date"] = parse_dates(df["date"], signature)
+        st["rows_out"] = int(df["date"].notna().sum())
     df = df.dropna(subset=["date"])
     df = df[df["date"] >= pd.Timestamp("2019-01-01")]
 
     # 🧮 Conversion per_100k ou per_million en valeurs absolues
-    pop = None
-    if "country" in df.columns:
-        if not df.empty:
-            pop = get_population(df["country"].iloc[0], cur)
-        else:
-            print("⚠️ DataFrame vide après nettoyage des dates, pas de population récupérée.")
-    else:
+    if "country" not in df.columns:
         print("⚠️ Colonne 'country' non détectée après le mapping.")
-
-
-    for col in df.columns:
-        if "per_100_000" in col or "per_100k" in col:
-            rate = pd.to_numeric(df[col], errors="coerce")
-            if pop:
-                abs_col = rate * pop / 100_000
-                if "excess_deaths" in col:
-                    df["deaths"] = abs_col.round().astype(int)
-                else:
-                    df["confirmed"] = abs_col.round().astype(int)
-
-        if "per_million" in col:
-            rate = pd.to_numeric(df[col], errors="coerce")
-            if pop:
-                abs_col = rate * pop / 1_000_000
-                if "deaths" in col:
-                    df["deaths"] = abs_col.round().astype(int)
-                else:
-                    df["confirmed"] = abs_col.round().astype(int)
-
-    # 📈 Calcul des cas/morts journaliers si pas dispo
-    if (df["new_cases"] == 0).all():
-        df["new_cases"] = df.groupby("country")["confirmed"].diff().fillna(0).astype(int)
-    if (df["new_deaths"] == 0).all():
-        df["new_deaths"] = df.groupby("country")["deaths"].diff().fillna(0).astype(int)
+    df = rates_to_absolute(df, population)
+
+    # 📈 Calcul des cas/morts journaliers si pas dispo dans le fichier
+    # (`carry` : dernières valeurs cumulées par pays quand le fichier est lu par blocs)
+    carry = carry if carry is not None else {}
+    for col in recompute:
+        source = daily_sources[col]
+        df[col] = diff_by_country(df, source, carry.get(source))
+    for col in ("confirmed", "deaths"):
+        if col in carry:
+            update_carry(df, col, carry[col])
 
     # 🌍 Nettoyage coordonnées géographiques
     df["latitude"] = pd.to_numeric(df["latitude"], errors="coerce").round(6)
@@ -149,14 +338,93 @@ def transform(df, cur):
 
     return df
 
-def connect_db():
-    return psycopg2.connect(**connection_params)
+def upsert_dimension(cur, table, id_col, columns, rows):
+    """Résout nom → id pour une table de dimension en un seul aller-retour.
+
+    `columns[0]` doit porter la contrainte UNIQUE (cf. BDD Création.txt) : les
+    noms inconnus sont insérés, les existants relus dans la même requête.
+    """
+    if not rows:
+        return {}
+    name_col = columns[0]
+    cols = ", ".join(columns)
+    query = f"""
+        WITH input({cols}) AS (VALUES %s),
+        ins AS (
+            INSERT INTO {table}({cols})
+            SELECT {cols} FROM input
+            ON CONFLICT ({name_col}) DO NOTHING
+            RETURNING {id_col}, {name_col}
+        )
+        SELECT {id_col}, {name_col} FROM ins
+        UNION ALL
+        SELECT t.{id_col}, t.{name_col} FROM {table} t JOIN input i ON t.{name_col} = i.{name_col}
+    """
+    result = execute_values(cur, query, rows, page_size=len(rows), fetch=True)
+    ids = {n: i for i, n in result}
+
+    # Nom inséré par une autre transaction pendant la requête : on le relit
+    missing = [r[0] for r in rows if r[0] not in ids]
+    if missing:
+        cur.execute(f"SELECT {id_col}, {name_col} FROM {table} WHERE {name_col} = ANY(%s)", (missing,))
+        ids.update({n: i for i, n in cur.fetchall()})
+    return ids
+
+def to_int_column(s):
+    return pd.to_numeric(s, errors="coerce").fillna(0).astype("int64")
+
+def build_rows(df, id_maladie, region_dict):
+    """Construit les lignes statistique d'un fichier en colonnes, sans iterrows."""
+    id_region = df["country"].map(region_dict).astype("float64")
+    valid = id_region.notna()
+    return pd.DataFrame({
+        "id_maladie": id_maladie,
+        "id_region": id_region[valid].astype("int64"),
+        "date": df.loc[valid, "date"].dt.normalize().astype("datetime64[ns]"),
+        "nouveau_mort": to_int_column(df.loc[valid, "new_deaths"]),
+        "nouveau_cas": to_int_column(df.loc[valid, "new_cases"]),
+        "total_mort": to_int_column(df.loc[valid, "deaths"]),
+        "total_cas": to_int_column(df.loc[valid, "confirmed"]),
+    })
+
+def collect_latlong(df, region_dict, latlong_updates):
+    """Garde, par région, le premier couple latitude/longitude renseigné."""
+    mask = df["latitude"].notna() & df["longitude"].notna()
+    coords = df.loc[mask, ["country", "latitude", "longitude"]]
+    coords = coords.assign(id_region=coords["country"].map(region_dict).astype("float64"))
+    coords = coords.dropna(subset=["id_region"]).drop_duplicates("id_region")
+    for id_region, lat, lon in zip(coords["id_region"].astype("int64"), coords["latitude"], coords["longitude"]):
+        latlong_updates.setdefault(int(id_region), (lat, lon))
+
+def update_region_coordinates(cur, latlong_updates):
+    """Renseigne latitude/longitude des régions qui n'en ont pas, en une requête ensembliste.
+
+    Les coordonnées passent par une table temporaire (execute_values, valeurs
+    paramétrées) puis un seul UPDATE ... FROM, au lieu d'un CASE par région.
+    """
+    if not latlong_updates:
+        return 0
+    cur.execute("""
+        DROP TABLE IF EXISTS region_coords;
+        CREATE TEMP TABLE region_coords (
+            id_region INTEGER PRIMARY KEY,
+            latitude DOUBLE PRECISION,
+            longitude DOUBLE PRECISION
+        ) ON COMMIT DROP;
+    """)
+    execute_values(
+        cur, "INSERT INTO region_coords(id_region, latitude, longitude) VALUES %s",
+        [(id_region, float(lat), float(lon)) for id_region, (lat, lon) in latlong_updates.items()],
+        page_size=10_000
+    )
+    cur.execute("""
+        UPDATE region r SET latitude = c.latitude, longitude = c.longitude
+        FROM region_coords c
+        WHERE r.id_region = c.id_region AND (r.latitude IS NULL OR r.longitude IS NULL)
+    """)
+    return cur.rowcount
 
-def prepare_temp_csv(rows):
-    df = pd.DataFrame(rows, columns=[
-        "id_maladie","id_region","date","nouveau_mort","nouveau_cas",
-        "total_mort","total_cas"
-    ])
+def aggregate_rows(df):
     df = df.groupby(["id_region","date"], as_index=False).agg({
         "id_maladie":"first",
         "nouveau_mort":"sum",
@@ -164,21 +432,130 @@ def prepare_temp_csv(rows):
         "total_mort":"max",
         "total_cas":"max"
     })
-    df = df[["id_region","date","id_maladie","nouveau_mort","nouveau_cas","total_mort","total_cas"]]
-    df.to_csv(temp_csv, index=False, header=False)
-
-def copy_into_temp_statistique(cur=None, conn=None):
-    close_after = False
-
-    # Si aucun curseur ou connexion n’a été fourni, on ouvre manuellement
-    if cur is None or conn is None:
-        conn = connect_db()
-        cur = conn.cursor()
-        close_after = True
-
-    cur.execute("""
-        DROP TABLE IF EXISTS temp_statistique;
-        CREATE TEMP TABLE temp_statistique (
+    return df[temp_statistique_columns]
+
+class StatAccumulator:
+    """Agrège au fil de l'eau les lignes statistique par (id_region, date).
+
+    L'accumulateur est un frame indexé par la clé : chaque lot est pré-agrégé,
+    les clés déjà connues sont mises à jour sur place (somme / max, « first »
+    garde la valeur existante) et seules les nouvelles clés sont ajoutées. Sa
+    taille dépend du nombre de clés distinctes, pas du nombre de lignes
+    brutes ; le résultat est celui d'un aggregate_rows sur la concaténation
+    des lots dans le même ordre.
+    """
+
+    keys = ["id_region", "date"]
+    sum_columns = ["nouveau_mort", "nouveau_cas"]
+    max_columns = ["total_mort", "total_cas"]
+
+    def __init__(self):
+        self.rows = empty_rows().set_index(self.keys)
+        self.nb_input_rows = 0
+
+    def add(self, df):
+        if df.empty:
+            return df
+        self.nb_input_rows += len(df)
+        df = aggregate_rows(df)
+        batch = df.set_index(self.keys)
+
+        known = batch.index.isin(self.rows.index)
+        if known.any():
+            common = batch.index[known]
+            current = self.rows.loc[common]
+            self.rows.loc[common, self.sum_columns] = (
+                current[self.sum_columns].to_numpy() + batch.loc[known, self.sum_columns].to_numpy()
+            )
+            self.rows.loc[common, self.max_columns] = np.maximum(
+                current[self.max_columns].to_numpy(), batch.loc[known, self.max_columns].to_numpy()
+            )
+        if not known.all():
+            new = batch[~known]
+            self.rows = new if self.rows.empty else pd.concat([self.rows, new])
+        return df
+
+    def result(self):
+        return self.rows.sort_index().reset_index()[temp_statistique_columns]
+
+def stream_rows(df, copy_format="csv"):
+    """Flux COPY (CSV ou PGCOPY binaire) des lignes déjà agrégées de `df`."""
+    if copy_format == "binary":
+        return ChunkStream(iter_binary_chunks(df))
+    return ChunkStream(iter_csv_chunks(df))
+
+def prepare_temp_csv(df, copy_format="csv"):
+    return stream_rows(aggregate_rows(df), copy_format)
+
+class ChunkStream:
+    """Objet fichier minimal (lecture seule) alimenté par un générateur de blocs
+    d'octets, pour envoyer un flux à `copy_expert` sans passer par le disque."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._current = b""
+        self._pos = 0
+
+    def read(self, size=-1):
+        parts = []
+        while size != 0:
+            if self._pos >= len(self._current):
+                try:
+                    self._current, self._pos = next(self._chunks), 0
+                except StopIteration:
+                    break
+                continue
+            end = len(self._current) if size < 0 else min(len(self._current), self._pos + size)
+            parts.append(self._current[self._pos:end])
+            if size > 0:
+                size -= end - self._pos
+            self._pos = end
+        return b"".join(parts)
+
+    def readline(self, size=-1):
+        return self.read(size)
+
+def iter_csv_chunks(df, chunk_rows=None):
+    """Sérialise `df` en CSV (sans en-tête) par blocs de `chunk_rows` lignes."""
+    chunk_rows = chunk_rows or copy_chunk_rows
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows].to_csv(index=False, header=False).encode("utf-8")
+
+def iter_binary_chunks(df, chunk_rows=None):
+    """Encode `df` (colonnes de temp_statistique) au format COPY binaire.
+
+    Chaque tuple est écrit directement depuis les tableaux NumPy via un dtype
+    structuré big-endian : nb de champs (int16) puis, par champ, longueur (int32)
+    et valeur (int32 ; jours depuis 2000-01-01 pour la date).
+    """
+    chunk_rows = chunk_rows or copy_chunk_rows
+    fields = [("nfields", ">i2")]
+    for col in temp_statistique_columns:
+        fields += [(f"{col}_len", ">i4"), (col, ">i4")]
+    tuple_dtype = np.dtype(fields)
+
+    yield PGCOPY_HEADER
+    for start in range(0, len(df), chunk_rows):
+        part = df.iloc[start:start + chunk_rows]
+        buf = np.empty(len(part), dtype=tuple_dtype)
+        buf["nfields"] = len(temp_statistique_columns)
+        for col in temp_statistique_columns:
+            if col == "date":
+                values = (part[col].to_numpy().astype("datetime64[D]") - PG_EPOCH).astype("int64")
+            else:
+                values = part[col].to_numpy("int64")
+            if len(values) and np.abs(values).max() > INT32_MAX:
+                raise ValueError(f"Valeur hors de la plage INTEGER dans la colonne {col}")
+            buf[f"{col}_len"] = 4
+            buf[col] = values
+        yield buf.tobytes()
+    yield PGCOPY_TRAILER
+
+def create_staging_table(cur, table="temp_statistique", temp=True):
+    kind = "TEMP TABLE" if temp else "UNLOGGED TABLE"
+    cur.execute(f"""
+        DROP TABLE IF EXISTS {table};
+        CREATE {kind} {table} (
             id_region INTEGER,
             date DATE,
             id_maladie INTEGER,
@@ -188,187 +565,691 @@ def copy_into_temp_statistique(cur=None, conn=None):
             total_cas INTEGER
         );
     """)
-    conn.commit()
 
-    print("⏳ Copie dans temp_statistique en cours...")
-    with open(temp_csv, "r") as f:
-        cur.copy_expert("""
-            COPY temp_statistique(id_region, date, id_maladie, nouveau_mort, nouveau_cas, total_mort, total_cas)
-            FROM STDIN WITH CSV
-        """, f)
-    conn.commit()
-    print("✅ Copie terminée !")
+def copy_stream(cur, stream, copy_format="csv", table="temp_statistique"):
+    options = "(FORMAT binary)" if copy_format == "binary" else "CSV"
+    cur.copy_expert(f"""
+        COPY {table}(id_region, date, id_maladie, nouveau_mort, nouveau_cas, total_mort, total_cas)
+        FROM STDIN WITH {options}
+    """, stream)
 
-    cur.execute("""
+def merge_staging_table(cur, table="temp_statistique"):
+    cur.execute(f"""
         INSERT INTO statistique (id_maladie, id_region, date, nouveau_mort, nouveau_cas, total_mort, total_cas)
         SELECT id_maladie, id_region, date, nouveau_mort, nouveau_cas, total_mort, total_cas
-        FROM temp_statistique
+        FROM {table} AS staging
         ON CONFLICT (id_region, date) DO UPDATE
           SET nouveau_mort = EXCLUDED.nouveau_mort,
               nouveau_cas = EXCLUDED.nouveau_cas,
               total_mort = EXCLUDED.total_mort,
               total_cas = EXCLUDED.total_cas;
     """)
-    conn.commit()
 
-    if close_after:
-        cur.close()
-        conn.close()
+def merge_staging_tables(cur, tables):
+    """Fusionne plusieurs tables de staging dans statistique en un seul INSERT ... SELECT.
 
-def run_etl():
+    Les paquets étant disjoints par (id_region, date), la réunion n'a pas de doublon.
+    """
+    union = " UNION ALL ".join(
+        f"SELECT id_maladie, id_region, date, nouveau_mort, nouveau_cas, total_mort, total_cas FROM {t}"
+        for t in tables
+    )
+    merge_staging_table(cur, f"({union})")
 
-    nb_fichiers_traite = 0
-    nb_fichiers_ignores = 0
+def affected_rows(cur):
+    return cur.rowcount if cur.rowcount >= 0 else None
 
+def copy_into_temp_statistique(stream, cur=None, conn=None, copy_format="csv"):
+    # Si aucun curseur ou connexion n’a été fourni, on en emprunte une au pool
+    if cur is None or conn is None:
+        with get_pool().connection() as conn, conn.cursor() as cur:
+            return copy_into_temp_statistique(stream, cur, conn, copy_format)
 
-    conn = connect_db()
-    conn.autocommit = False  # On gère la transaction manuellement
-    cur = conn.cursor()
+    create_staging_table(cur)
+    conn.commit()
 
-    # Chargement mapping BD existant
-    cur.execute("SELECT id_maladie, nom_maladie FROM maladie")
-    maladie_dict = {n: i for i, n in cur.fetchall()}
-    cur.execute("SELECT id_pays, nom_pays FROM pays")
-    pays_dict = {n: i for i, n in cur.fetchall()}
-    cur.execute("SELECT id_region, nom_region FROM region")
-    region_dict = {n: i for i, n in cur.fetchall()}
+    print("⏳ Copie dans temp_statistique en cours...")
+    with stage("copy") as st:
+        copy_stream(cur, stream, copy_format)
+        conn.commit()
+        st["rows_out"] = affected_rows(cur)
+    print("✅ Copie terminée !")
 
-    all_rows = []  # ✅ initialise la liste des lignes à insérer
+    with stage("merge") as st:
+        merge_staging_table(cur)
+        conn.commit()
+        st["rows_out"] = affected_rows(cur)
+
+def shard_rows(df, nb_shards, shard_key="id_region"):
+    """Répartit les lignes agrégées en `nb_shards` paquets par hash de `shard_key`.
+
+    Les lignes étant uniques par (id_region, date), deux paquets ne touchent
+    jamais la même ligne de statistique : les fusions ne se bloquent pas.
+    """
+    buckets = pd.util.hash_array(df[shard_key].to_numpy()) % nb_shards
+    return [df[buckets == i] for i in range(nb_shards)]
+
+def load_shard(conn, df, shard_no, copy_format="csv"):
+    """COPY + fusion d'un paquet sur sa propre connexion, sans commit.
+
+    La table de staging n'est pas temporaire (PREPARE TRANSACTION les refuse) :
+    elle est créée puis supprimée dans la transaction, donc jamais visible ailleurs.
+    """
+    table = f"staging_statistique_{os.getpid()}_{shard_no}"
+    with conn.cursor() as cur:
+        create_staging_table(cur, table, temp=False)
+        with stage("copy", rows_in=len(df)) as st:
+            copy_stream(cur, stream_rows(df, copy_format), copy_format, table)
+            st["rows_out"] = affected_rows(cur)
+        with stage("merge") as st:
+            merge_staging_table(cur, table)
+            st["rows_out"] = affected_rows(cur)
+        cur.execute(f"DROP TABLE {table}")
+    return len(df)
+
+def copy_shard(conn, df, table, copy_format="csv"):
+    """COPY d'un paquet dans sa table de staging, committée sur sa connexion.
+
+    Seule la table de staging est écrite : statistique n'est modifiée que par
+    la fusion finale, en une transaction.
+    """
+    with conn.cursor() as cur:
+        create_staging_table(cur, table, temp=False)
+        with stage("copy", rows_in=len(df)) as st:
+            copy_stream(cur, stream_rows(df, copy_format), copy_format, table)
+            st["rows_out"] = affected_rows(cur)
+    conn.commit()
+    return len(df)
 
-    new_pays = {}
-    new_regions = {}
-    latlong_updates = {}  # ✅ On le déclare ici une seule fois pour tout le run
+def drop_staging_tables(conn, tables):
+    """Supprime les tables de staging (au mieux : un échec est signalé, pas levé)."""
+    try:
+        conn.rollback()
+        with conn.cursor() as cur:
+            cur.execute("DROP TABLE IF EXISTS " + ", ".join(tables))
+        conn.commit()
+    except Exception as e:
+        print(f"⚠️ Tables de staging non supprimées ({', '.join(tables)}) : {e}")
+
+def rollback_shards(conns, two_phase):
+    """Annule la transaction de chaque connexion, une par une : l'échec de l'une
+    (connexion cassée...) n'empêche pas d'annuler les autres, qui sinon
+    garderaient des transactions PREPARED verrouillant statistique."""
+    failed = 0
+    for conn in conns:
+        try:
+            if two_phase:
+                conn.tpc_rollback()
+            else:
+                conn.rollback()
+        except Exception as e:
+            failed += 1
+            print(f"⚠️ Annulation impossible sur une connexion de chargement : {e}")
+    return failed
+
+def parallel_copy_into_statistique(df, nb_workers, copy_format="csv", shard_key="id_region", two_phase=False,
+                                   pool=None):
+    """Charge `df` (lignes agrégées) dans statistique via `nb_workers` connexions, tout ou rien.
+
+    Par défaut, chaque paquet est copié en parallèle dans sa propre table de
+    staging (UNLOGGED), puis une seule transaction fusionne toutes les tables
+    dans statistique : un échec, pendant la copie ou la fusion, ne laisse
+    aucune ligne chargée. Avec `two_phase`, chaque connexion fusionne son
+    paquet puis fait un PREPARE TRANSACTION avant le commit final (nécessite
+    max_prepared_transactions > 0 côté serveur).
+    """
+    shards = [(i, shard) for i, shard in enumerate(shard_rows(df, nb_workers, shard_key)) if not shard.empty]
+    if not shards:
+        return
+    pool = pool or get_pool()
+    gtrid = f"etl_oms_{os.getpid()}_{int(time.time())}"
+    with ExitStack() as stack:
+        conns = [stack.enter_context(pool.connection()) for _ in shards]
+        if two_phase:
+            two_phase_copy(shards, conns, gtrid, copy_format)
+        else:
+            staged_copy(shards, conns, gtrid, copy_format)
+        print("✅ Copie parallèle terminée !")
+
+def run_shards(task, jobs, copy_format):
+    """Exécute `task(conn, paquet, arg, copy_format)` pour chaque (conn, paquet, arg),
+    en parallèle ; renvoie les erreurs rencontrées."""
+    print(f"⏳ Copie parallèle de {sum(len(shard) for _, shard, _ in jobs)} lignes sur {len(jobs)} connexions...")
+    errors = []
+    with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+        futures = [executor.submit(task, conn, shard, arg, copy_format) for conn, shard, arg in jobs]
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                errors.append(e)
+    return errors
+
+def staged_copy(shards, conns, gtrid, copy_format):
+    """COPY parallèles en tables de staging puis une seule fusion transactionnelle."""
+    tables = [f"staging_statistique_{gtrid}_{shard_no}" for shard_no, _ in shards]
+    errors = run_shards(copy_shard, [(conn, shard, table) for (_, shard), conn, table in zip(shards, conns, tables)],
+                        copy_format)
+    if errors:
+        rollback_shards(conns, False)
+        drop_staging_tables(conns[0], tables)
+        print(f"❌ {len(errors)} paquet(s) en échec, chargement annulé (statistique inchangée).")
+        raise errors[0]
+
+    conn = conns[0]
+    try:
+        with conn.cursor() as cur:
+            with stage("merge", rows_in=sum(len(shard) for _, shard in shards)) as st:
+                merge_staging_tables(cur, tables)
+                st["rows_out"] = affected_rows(cur)
+            cur.execute("DROP TABLE " + ", ".join(tables))
+        conn.commit()
+    except Exception:
+        print("❌ Fusion en échec, chargement annulé (statistique inchangée).")
+        drop_staging_tables(conn, tables)
+        raise
+
+def two_phase_copy(shards, conns, gtrid, copy_format):
+    """Fusion par connexion puis commit en deux phases (PREPARE TRANSACTION)."""
+    for (shard_no, _), conn in zip(shards, conns):
+        conn.tpc_begin(conn.xid(0, gtrid, f"shard_{shard_no}"))
+
+    errors = run_shards(load_shard, [(conn, shard, shard_no) for (shard_no, shard), conn in zip(shards, conns)],
+                        copy_format)
+    if errors:
+        rollback_shards(conns, True)
+        print(f"❌ {len(errors)} paquet(s) en échec, chargement annulé.")
+        raise errors[0]
 
-    for fn in os.listdir(datasets_folder):
-        if not fn.lower().endswith((".csv", ".json")):
-            continue
-        path = os.path.join(datasets_folder, fn)
-        mal = detect_maladie(fn)
-        print(f"📄 {fn} → {mal}")
-        df_raw = extract(path)
-        df = transform(df_raw, cur)
-        if "country" not in df.columns or df.empty:
-            print(f"⚠️ Fichier {fn} ignoré car pas de colonne 'country' ou DataFrame vide après filtrage.")
-            nb_fichiers_ignores += 1
+    try:
+        for conn in conns:
+            conn.tpc_prepare()
+    except Exception:
+        if rollback_shards(conns, True):
+            print(f"⚠️ Vérifier pg_prepared_xacts (gid contenant {gtrid}) : "
+                  "transactions préparées à annuler avec ROLLBACK PREPARED.")
+        raise
+    # Tous préparés : chaque commit est tenté, un échec n'empêche pas les suivants
+    failed = []
+    for (shard_no, _), conn in zip(shards, conns):
+        try:
+            conn.tpc_commit()
+        except Exception as e:
+            failed.append((shard_no, e))
+    if failed:
+        print(f"❌ {len(failed)} paquet(s) préparé(s) non commité(s) : terminer avec COMMIT PREPARED "
+              f"(pg_prepared_xacts, gid contenant {gtrid}).")
+        raise failed[0][1]
+
+class PostgresSink:
+    """Cible PostgreSQL : dimensions par upsert groupé, statistique par COPY + fusion.
+
+    Une connexion est empruntée au pool partagé pour tout le run (+1 par paquet
+    du chargement parallèle).
+    """
+
+    def __init__(self, copy_format="csv", parallel=1, shard_key="id_region", two_phase=False):
+        self.copy_format = copy_format
+        self.parallel = parallel
+        self.shard_key = shard_key
+        self.two_phase = two_phase
+        self._stack = ExitStack()
+
+    def __enter__(self):
+        self.conn = self._stack.enter_context(get_pool(maxconn=self.parallel + 1).connection())
+        self.conn.autocommit = False  # On gère la transaction manuellement
+        self.cur = self._stack.enter_context(self.conn.cursor())
+        return self
+
+    def __exit__(self, *exc):
+        self._stack.close()
+
+    def dimensions(self):
+        """Dictionnaires nom → id des tables maladie, pays et region existantes."""
+        dicts = []
+        for table in ("maladie", "pays", "region"):
+            self.cur.execute(f"SELECT id_{table}, nom_{table} FROM {table}")
+            dicts.append({n: i for i, n in self.cur.fetchall()})
+        return tuple(dicts)
+
+    def population(self):
+        return load_population(self.cur)
+
+    def resolve(self, table, id_col, columns, rows):
+        return upsert_dimension(self.cur, table, id_col, columns, rows)
+
+    def update_coordinates(self, latlong_updates):
+        return update_region_coordinates(self.cur, latlong_updates)
+
+    def load(self, rows):
+        if self.parallel > 1:
+            # Les dimensions et coordonnées doivent être visibles des autres connexions
+            self.conn.commit()
+            parallel_copy_into_statistique(rows, self.parallel, self.copy_format, self.shard_key, self.two_phase)
+        else:
+            copy_into_temp_statistique(stream_rows(rows, self.copy_format), self.cur, self.conn, self.copy_format)
+
+    def commit(self):
+        self.conn.commit()
+
+class FileSink:
+    """Cible hors ligne : tables prêtes pour la BD, sans connexion.
+
+    Les clés (id_maladie, id_pays, id_region) sont attribuées en mémoire par
+    factorisation ; à la validation, chaque maladie est écrite dans son dossier
+    `<folder>/<maladie>/` (Maladie, Pays, Region, Statistique) par etl_output.
+    """
+
+    def __init__(self, folder=None, file_format="csv"):
+        if file_format not in output_formats:
+            raise ValueError(f"Format de sortie inconnu : {file_format}")
+        self.folder = folder or output_folder
+        self.file_format = file_format
+        self.tables = {}
+        self.statistique = empty_rows()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def dimensions(self):
+        dicts = []
+        for table in ("maladie", "pays", "region"):
+            df = self.tables.get(table)
+            dicts.append({} if df is None else dict(zip(df[f"nom_{table}"], df[f"id_{table}"].tolist())))
+        return tuple(dicts)
+
+    def population(self):
+        return load_population()
+
+    def resolve(self, table, id_col, columns, rows):
+        if not rows:
+            return {}
+        new = pd.DataFrame(rows, columns=columns).drop_duplicates(columns[0], ignore_index=True)
+        known = self.tables.get(table)
+        start = 0 if known is None else int(known[id_col].max())
+        if known is not None:
+            new = new[~new[columns[0]].isin(known[columns[0]])]
+        codes, _ = pd.factorize(new[columns[0]])
+        new.insert(0, id_col, start + codes + 1)
+        self.tables[table] = new if known is None else pd.concat([known, new], ignore_index=True)
+        ids = self.tables[table].set_index(columns[0])[id_col]
+        return ids[ids.index.isin([r[0] for r in rows])].to_dict()
+
+    def update_coordinates(self, latlong_updates):
+        region = self.tables.get("region")
+        if region is None or not latlong_updates:
+            return 0
+        coords = pd.DataFrame.from_dict(latlong_updates, orient="index", columns=["latitude", "longitude"])
+        region = region.reindex(columns=region_file_columns)
+        # Comme en base : seules les régions sans coordonnées sont renseignées
+        missing = (region["latitude"].isna() | region["longitude"].isna()) & region["id_region"].isin(coords.index)
+        for col in ("latitude", "longitude"):
+            region.loc[missing, col] = region.loc[missing, "id_region"].map(coords[col])
+        self.tables["region"] = region
+        return int(missing.sum())
+
+    def load(self, rows):
+        self.statistique = rows
+
+    def commit(self):
+        maladie = self.tables.get("maladie", pd.DataFrame(columns=["id_maladie", "nom_maladie"]))
+        region = self.tables.get("region", pd.DataFrame()).reindex(columns=region_file_columns)
+        pays = self.tables.get("pays", pd.DataFrame(columns=["id_pays", "nom_pays"]))
+        stats = self.statistique.groupby("id_maladie", sort=False)
+        for id_maladie, nom_maladie in zip(maladie["id_maladie"], maladie["nom_maladie"]):
+            part = stats.get_group(id_maladie) if id_maladie in stats.groups else self.statistique.iloc[0:0]
+            part_regions = region[region["id_region"].isin(part["id_region"])]
+            folder = os.path.join(self.folder, str(nom_maladie))
+            for name, df in (
+                ("Maladie", maladie[maladie["id_maladie"] == id_maladie]),
+                ("Pays", pays[pays["id_pays"].isin(part_regions["id_pays"])]),
+                ("Region", part_regions),
+                ("Statistique", part),
+            ):
+                write_table(df, os.path.join(folder, name), (self.file_format,))
+            print(f"💾 {nom_maladie} : {len(part)} lignes statistique écrites dans {folder}")
+
+def iter_dataset_files():
+    for fn in sorted(os.listdir(datasets_folder)):
+        if not fn.lower().endswith((".csv", ".json") + ndjson_extensions):
             continue
+        yield fn, os.path.join(datasets_folder, fn)
+
+def transform_chunks(path, population, chunksize):
+    """Transforme un fichier bloc par bloc ; seule la projection `cache_columns`
+    de chaque bloc est conservée, la mémoire ne dépend plus de la taille du fichier."""
+    carry = {"confirmed": {}, "deaths": {}}
+    recompute = None
+    parts = []
+    chunks = extract_chunks(path, chunksize)
+    bytes_read = os.path.getsize(path)
+    while True:
+        # Lecture du bloc suivant mesurée à part de sa transformation
+        with stage("extract", bytes_read=bytes_read) as st:
+            chunk = next(chunks, None)
+            st["rows_out"] = 0 if chunk is None else len(chunk)
+        if chunk is None:
+            break
+        bytes_read = None
+        if recompute is None:
+            # Décision prise sur l'en-tête du premier bloc, puis imposée aux suivants
+            recompute = daily_columns_to_compute(column_mapper.rename(chunk.head(0))[0].columns)
+        with stage("transform", rows_in=len(chunk)) as st:
+            df = transform(chunk, population, carry, recompute)
+            st["rows_out"] = len(df)
+        if "country" in df.columns and not df.empty:
+            parts.append(df[cache_columns])
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+
+def process_file(fn, path, population=None, chunksize=None):
+    """Extract + transform d'un fichier ; renvoie (fichier, maladie, DataFrame ou None)."""
+    with file_context(fn):
+        return _process_file(fn, path, population, chunksize)
+
+def _process_file(fn, path, population, chunksize):
+    mal = detect_maladie(fn)
+    print(f"📄 {fn} → {mal}")
+    if chunksize:
+        df = transform_chunks(path, population, chunksize)
+    else:
+        with stage("extract", bytes_read=os.path.getsize(path)) as st:
+            df_raw = extract(path)
+            st["rows_out"] = len(df_raw)
+        with stage("transform", rows_in=len(df_raw)) as st:
+            df = transform(df_raw, population)
+            st["rows_out"] = len(df)
+    if "country" not in df.columns or df.empty:
+        print(f"⚠️ Fichier {fn} ignoré car pas de colonne 'country' ou DataFrame vide après filtrage.")
+        return fn, mal, None
+
+    # ➕ Ajoute cette sécurité :
+    df = df[df["country"].notna()]
+    return fn, mal, df[cache_columns]
+
+def frame_to_payload(df):
+    """Projection compacte d'un fichier transformé, pour l'IPC.
+
+    Tableaux NumPy pour les colonnes numériques et dates ; colonnes texte en
+    codes int32 + valeurs distinctes (catégories : leurs codes). Les dtypes
+    d'origine voyagent avec le payload pour que le frame reconstruit soit
+    identique à celui du chemin séquentiel.
+    """
+    df = df[cache_columns]
+    payload = {"index": df.index.to_numpy(), "dtypes": df.dtypes.to_dict(), "columns": {}}
+    for col in cache_columns:
+        values = df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            payload["columns"][col] = ("codes", values.cat.codes.to_numpy(), None)
+        elif pd.api.types.is_string_dtype(values.dtype):
+            codes, uniques = pd.factorize(values)
+            payload["columns"][col] = ("codes", codes.astype("int32"), np.asarray(uniques, dtype=object))
+        else:
+            payload["columns"][col] = ("values", values.to_numpy(), None)
+    return payload
+
+def payload_to_frame(payload):
+    data = {}
+    for col, (kind, values, uniques) in payload["columns"].items():
+        dtype = payload["dtypes"][col]
+        if kind == "values":
+            data[col] = values
+        elif uniques is None:
+            data[col] = pd.Categorical.from_codes(values, dtype=dtype)
+        else:
+            # Code -1 = valeur manquante
+            data[col] = pd.Categorical.from_codes(values, uniques)
+    df = pd.DataFrame(data, columns=cache_columns, index=payload["index"])
+    return df.astype(payload["dtypes"])
+
+def process_file_payload(fn, path, population=None, chunksize=None):
+    """Tâche exécutée dans un worker : aucun accès à la base de données.
+
+    Les mesures du worker sont renvoyées avec le résultat (rapport propre à la tâche).
+    """
+    with activate(RunReport()) as report:
+        fn, mal, df = process_file(fn, path, population, chunksize)
+    return fn, mal, None if df is None else frame_to_payload(df), report.stages()
+
+def load_frames(population=None, workers=1, files=None, chunksize=None):
+    """Extrait et transforme chaque fichier une seule fois.
+
+    Renvoie le cache du run : une liste de (fichier, maladie, DataFrame) réduite
+    aux colonnes utiles au chargement, plus la liste des fichiers ignorés.
+    Avec `workers` > 1, un fichier = une tâche d'un ProcessPoolExecutor ; le
+    coordinateur garde seul la connexion BD (la population est passée à chaque tâche).
+    """
+    files = list(iter_dataset_files()) if files is None else files
+    if workers > 1 and len(files) > 1:
+        results = []
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for fn, mal, payload, records in pool.map(
+                process_file_payload, [fn for fn, _ in files], [path for _, path in files],
+                [population] * len(files), [chunksize] * len(files)
+            ):
+                if active_report() is not None:
+                    active_report().merge(records)
+                results.append((fn, mal, None if payload is None else payload_to_frame(payload)))
+    else:
+        results = [process_file(fn, path, population, chunksize) for fn, path in files]
 
-        nb_fichiers_traite += 1
-
-
-        # ➕ Ajoute cette sécurité :
-        df = df[df["country"].notna()]
-
-
-        # Upsert maladie
-        if mal not in maladie_dict:
-            cur.execute("INSERT INTO maladie(nom_maladie) VALUES(%s) RETURNING id_maladie", (mal,))
-            maladie_dict[mal] = cur.fetchone()[0]
-
-        id_maladie = maladie_dict[mal]
-
-        for _, r in df.iterrows():
-            country = r["country"]
-            if pd.isna(country):
-                print(f"❌ Ligne ignorée : 'country' vide dans {fn}")
-                continue
-
-
-            # Mémorise les pays inconnus
-            if country not in pays_dict and country not in new_pays:
-                new_pays[country] = None
-
-    # Batch insert des nouveaux pays
-    for country in new_pays:
-        cur.execute("INSERT INTO pays(nom_pays) VALUES(%s) RETURNING id_pays", (country,))
-        new_pays[country] = cur.fetchone()[0]
-    pays_dict.update(new_pays)
+    frames = [r for r in results if r[2] is not None]
+    return frames, [fn for fn, _, df in results if df is None]
 
-    # Relecture fichier + traitement final avec pays/régions
-    for fn in os.listdir(datasets_folder):
-        if not fn.lower().endswith((".csv", ".json")):
-            continue
-        path = os.path.join(datasets_folder, fn)
-        mal = detect_maladie(fn)
-        df_raw = extract(path)
-        df = transform(df_raw, cur)
-        if "country" not in df.columns or df.empty:
-            print(f"⚠️ Fichier {fn} ignoré car pas de colonne 'country' ou DataFrame vide après filtrage.")
-            continue
+def empty_rows():
+    return pd.DataFrame({
+        col: pd.Series(dtype="datetime64[ns]" if col == "date" else "int64")
+        for col in temp_statistique_columns
+    })
 
-        df = df[df["country"].notna()]  # ← ajoute cette ligne ici aussi !
+def incremental_rows(manifest, file_rows):
+    """Lignes à recharger pour les fichiers modifiés (mode incrémental).
+
+    Seules les clés (id_region, date) dont les valeurs ont changé sont gardées ;
+    comme une clé peut venir de plusieurs fichiers, elle est ré-agrégée avec les
+    lignes des fichiers inchangés mémorisées dans le manifeste.
+    """
+    keys = [changed_keys(rows, manifest.previous_rows(path)) for path, rows in file_rows]
+    keys = pd.concat(keys, ignore_index=True).drop_duplicates() if keys else pd.DataFrame()
+    if keys.empty:
+        return empty_rows()
+    current = [rows.merge(keys, on=["id_region", "date"]) for _, rows in file_rows]
+    others = manifest.rows_for_keys(keys, [path for path, _ in file_rows])
+    return aggregate_rows(pd.concat(current + [others[temp_statistique_columns]], ignore_index=True))
+
+def run_etl(copy_format="csv", parallel=1, shard_key="id_region", two_phase=False, workers=1,
+            incremental=False, chunksize=None, staging=False, load_from_cache=False, report=None, sink=None):
+    """Exécute l'ETL complet ; renvoie le RunReport (temps, lignes, mémoire par fichier et étape).
+
+    `sink` : cible du chargement (PostgresSink par défaut, FileSink pour un run hors ligne).
+    """
+    report = report or RunReport()
+    sink = sink or PostgresSink(copy_format, parallel, shard_key, two_phase)
+    with activate(report):
+        _run_etl(sink, workers, incremental, chunksize, staging, load_from_cache)
+    report.finish()
+    report.extra["pool"] = get_pool().stats()
+    report.extra["column_mapping"] = column_mapper.stats()
+    return report
+
+def _run_etl(sink, workers, incremental, chunksize, staging, load_from_cache):
+    with sink:
+        # Chargement mapping BD existant
+        maladie_dict, pays_dict, region_dict = sink.dimensions()
+
+        latlong_updates = {}  # ✅ On le déclare ici une seule fois pour tout le run
+
+        files = [] if load_from_cache else list(iter_dataset_files())
+        manifest = Manifest() if incremental else None
+        if manifest:
+            # ⏭️ Fichiers identiques au dernier chargement : ni extraits, ni rechargés
+            unchanged = {fn for fn, path in files if manifest.is_unchanged(path)}
+            files = [(fn, path) for fn, path in files if fn not in unchanged]
+            print(f"⏭️ Mode incrémental : {len(unchanged)} fichiers inchangés, {len(files)} à traiter.")
+
+        # 🗂️ Un seul passage extract/transform par fichier, réutilisé ensuite
+        cache = StagingCache() if staging or load_from_cache else None
+        if load_from_cache:
+            # 📦 Relance load-only : aucune lecture de DATASETS
+            with stage("staging_cache") as st:
+                frames, ignored_files = cache.load_all()
+                st["rows_out"] = sum(len(df) for _, _, df in frames)
+            print(f"📦 {len(frames)} fichiers relus depuis le cache de staging.")
+        else:
+            with stage("staging_cache"):
+                cached_frames, cached_ignored, to_process = cache.split(files) if cache else ([], [], files)
+            with stage("load_population") as st:
+                population = sink.population() if to_process else None
+                st["rows_out"] = None if population is None else len(population)
+            frames, ignored_files = load_frames(population, workers, to_process, chunksize)
+            if cache:
+                paths = dict(to_process)
+                with stage("staging_cache"):
+                    for fn, mal, df in frames:
+                        cache.put(fn, paths[fn], mal, df)
+                    for fn in ignored_files:
+                        cache.put(fn, paths[fn], None, None)
+                    cache.save()
+                print(f"📦 Cache de staging : {len(cached_frames) + len(cached_ignored)} fichiers réutilisés, "
+                      f"{len(to_process)} transformés.")
+                frames = sorted(cached_frames + frames, key=lambda f: f[0])
+                ignored_files = sorted(cached_ignored + ignored_files)
+        nb_fichiers_traite = len(frames)
+        nb_fichiers_ignores = len(ignored_files)
+
+        with stage("dimension_resolve") as st:
+            # Upsert maladie
+            new_maladies = list(dict.fromkeys(mal for _, mal, _ in frames if mal not in maladie_dict))
+            maladie_dict.update(sink.resolve("maladie", "id_maladie", ["nom_maladie"], [(m,) for m in new_maladies]))
+
+            # Pays/régions présents dans le cache, dans l'ordre d'apparition
+            countries = pd.unique(pd.concat([df["country"] for _, _, df in frames])) if frames else []
+
+            # Upsert groupé des nouveaux pays puis des nouvelles régions (1 requête chacun)
+            new_pays = [c for c in countries if c not in pays_dict]
+            pays_dict.update(sink.resolve("pays", "id_pays", ["nom_pays"], [(c,) for c in new_pays]))
+            new_regions = [c for c in countries if c not in region_dict]
+            region_dict.update(sink.resolve(
+                "region", "id_region", ["nom_region", "id_pays"],
+                [(c, pays_dict[c]) for c in new_regions]
+            ))
+            st["rows_out"] = len(new_maladies) + len(new_pays) + len(new_regions)
+
+        # Construction vectorisée des lignes, pré-agrégées fichier par fichier ;
+        # chaque frame transformée est libérée dès qu'elle a été repliée
+        accumulator = StatAccumulator()
+        file_rows = []
+        frames.reverse()
+        while frames:
+            fn, mal, df = frames.pop()
+            with file_context(fn), stage("row_build", rows_in=len(df)) as st:
+                collect_latlong(df, region_dict, latlong_updates)
+                rows = build_rows(df, maladie_dict[mal], region_dict)
+                if manifest:
+                    file_rows.append((os.path.join(datasets_folder, fn), aggregate_rows(rows)))
+                else:
+                    accumulator.add(rows)
+                st["rows_out"] = len(rows)
 
-        id_maladie = maladie_dict[mal]
+        region_dict = sink.dimensions()[2]  # 🔁 recharge depuis la cible
 
-        for _, r in df.iterrows():
-            country = r["country"]
-            id_pays = pays_dict[country]
-            if pd.isna(country):
-                print(f"❌ Ligne ignorée : 'country' vide dans {fn}")
-                continue
-            id_pays = pays_dict[country]
-
-
-            # Upsert region (1 seule fois par nom)
-            if country not in region_dict and country not in new_regions:
-                cur.execute(
-                    "INSERT INTO region(nom_region, id_pays) VALUES(%s, %s) RETURNING id_region",
-                    (country, id_pays)
-                )
-                new_regions[country] = cur.fetchone()[0]
-
-            id_region = region_dict.get(country) or new_regions[country]
-
-            # maj lat/long
-            if pd.notna(r["latitude"]) and pd.notna(r["longitude"]) and id_region not in latlong_updates:
-                latlong_updates[id_region] = (r["latitude"], r["longitude"])
-
-            # valeurs
-            nm = int(r["new_deaths"]) if not pd.isna(r["new_deaths"]) else 0
-            nc = int(r["new_cases"]) if not pd.isna(r["new_cases"]) else 0
-            tm = int(r["deaths"]) if not pd.isna(r["deaths"]) else 0
-            tc = int(r["confirmed"]) if not pd.isna(r["confirmed"]) else 0
-
-            all_rows.append((id_maladie, id_region, r["date"].date(), nm, nc, tm, tc))
-
-    region_dict.update(new_regions)
-    cur.execute("SELECT id_region, nom_region FROM region")
-    region_dict = {n: i for i, n in cur.fetchall()}  # 🔁 recharge depuis BDD
-
-    if latlong_updates:
-        print(f"📌 Mise à jour de {len(latlong_updates)} régions avec coordonnées GPS...")
-        update_query = """
-            UPDATE region SET
-                latitude = CASE id_region
-                    {lat_cases}
-                END,
-                longitude = CASE id_region
-                    {long_cases}
-                END
-            WHERE id_region IN ({ids}) AND (latitude IS NULL OR longitude IS NULL)
-        """
-        lat_cases = "\n".join([f"WHEN {id_} THEN {latlong_updates[id_][0]}" for id_ in latlong_updates])
-        long_cases = "\n".join([f"WHEN {id_} THEN {latlong_updates[id_][1]}" for id_ in latlong_updates])
-        ids = ",".join(map(str, latlong_updates.keys()))
-        cur.execute(update_query.format(lat_cases=lat_cases, long_cases=long_cases, ids=ids))
-
-    all_rows = [row for row in all_rows if row[1] in region_dict.values()]
-    if not all_rows:
-        print("⚠️ Aucun enregistrement valide à insérer (tous les id_region ont été filtrés).")
-        cur.close()
-        conn.close()
-        return
+        if latlong_updates:
+            print(f"📌 Mise à jour de {len(latlong_updates)} régions avec coordonnées GPS...")
+            with stage("latlong_update", rows_in=len(latlong_updates)) as st:
+                st["rows_out"] = sink.update_coordinates(latlong_updates)
 
-    prepare_temp_csv(all_rows)
-    copy_into_temp_statistique(cur, conn)
-    os.remove(temp_csv)
+        if manifest:
+            file_rows += [(os.path.join(datasets_folder, fn), empty_rows()) for fn in ignored_files]
+            all_rows = incremental_rows(manifest, file_rows)
+            print(f"🔁 {len(all_rows)} lignes (id_region, date) modifiées à recharger.")
+        else:
+            all_rows = accumulator.result()
+            print(f"🧮 {accumulator.nb_input_rows} lignes agrégées en {len(all_rows)} clés (id_region, date).")
+        # Lignes déjà agrégées par (id_region, date) : plus de groupby avant le COPY
+        all_rows = all_rows[all_rows["id_region"].isin(list(region_dict.values()))]
 
-    conn.commit()
-    cur.close()
-    conn.close()
+        if all_rows.empty:
+            print("⚠️ Aucun enregistrement valide à insérer (tous les id_region ont été filtrés).")
+        else:
+            with stage("load", rows_in=len(all_rows)):
+                sink.load(all_rows)
+
+        with stage("commit"):
+            sink.commit()
+
+    # Le manifeste n'est mis à jour qu'une fois la base commitée
+    if manifest:
+        for path, rows in file_rows:
+            manifest.record(path, rows)
+        manifest.commit()
+        manifest.close()
     print(f"📊 Bilan : {nb_fichiers_traite} fichiers traités, {nb_fichiers_ignores} fichiers ignorés.")
     print("✅ ETL terminé avec traitement optimisé !")
 
+def main():
+    parser = argparse.ArgumentParser(description="ETL OMS vers PostgreSQL")
+    parser.add_argument("--copy-format", choices=copy_formats, default="csv",
+                        help="Format du COPY vers temp_statistique (binary = PGCOPY, csv = repli)")
+    parser.add_argument("--parallel", type=int, default=1,
+                        help="Nombre de connexions pour charger statistique en parallèle (tout ou rien)")
+    parser.add_argument("--shard-key", choices=("id_region", "id_maladie"), default="id_region",
+                        help="Clé de répartition des lignes entre connexions")
+    parser.add_argument("--two-phase", action="store_true",
+                        help="Fusion par connexion + commit en deux phases au lieu d'une fusion unique "
+                             "(max_prepared_transactions > 0)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Nombre de processus pour extraire/transformer les fichiers")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Ignore les fichiers inchangés et ne recharge que les lignes modifiées")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="Lecture des CSV/NDJSON par blocs de N lignes (mémoire bornée)")
+    parser.add_argument("--staging", action="store_true",
+                        help="Met en cache (Arrow IPC) les fichiers transformés, réutilisés s'ils sont inchangés")
+    parser.add_argument("--load-from-cache", action="store_true",
+                        help="Relance load-only depuis le cache de staging, sans extraction")
+    parser.add_argument("--sink", choices=("postgres", "files"), default="postgres",
+                        help="Cible du chargement : PostgreSQL ou fichiers prêts pour la BD (hors ligne)")
+    parser.add_argument("--output-dir", default=output_folder,
+                        help="Dossier des fichiers écrits avec --sink files (un sous-dossier par maladie)")
+    parser.add_argument("--output-format", choices=output_formats, default="csv",
+                        help="Format des fichiers écrits avec --sink files")
+    parser.add_argument("--report", metavar="FICHIER.json",
+                        help="Écrit le rapport du run (temps, lignes, octets, RSS par fichier et étape)")
+    parser.add_argument("--profile", metavar="FICHIER.prof",
+                        help="Profil cProfile du run (lisible avec pstats ou snakeviz)")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="Ajoute au rapport le pic et les principales allocations Python")
+    args = parser.parse_args()
+    if args.load_from_cache and args.incremental:
+        parser.error("--load-from-cache et --incremental sont incompatibles")
+    if args.sink == "files" and args.incremental:
+        # Les clés du FileSink sont attribuées à chaque run : le manifeste ne peut pas s'y fier
+        parser.error("--incremental n'est disponible qu'avec --sink postgres")
+    sink = FileSink(args.output_dir, args.output_format) if args.sink == "files" else None
+
+    start = time.time()
+    report = RunReport()
+    try:
+        with profiling(report, args.profile, args.tracemalloc):
+            run_etl(copy_format=args.copy_format, parallel=args.parallel,
+                    shard_key=args.shard_key, two_phase=args.two_phase, workers=args.workers,
+                    incremental=args.incremental, chunksize=args.chunksize,
+                    staging=args.staging, load_from_cache=args.load_from_cache, report=report, sink=sink)
+        stats = get_pool().stats()
+        if stats["checkouts"]:
+            print(f"🔌 Pool : {stats['checkouts']} emprunts, {stats['hits']} réutilisations, "
+                  f"{stats['misses']} connexions ouvertes, attente max {stats['max_wait_seconds']:.3f}s")
+    finally:
+        close_pool()
+        # Rapport écrit même en cas d'échec : les étapes déjà mesurées y figurent
+        if args.report:
+            if report.total_seconds is None:
+                report.finish()
+            report.write_json(args.report)
+            print(f"🧾 Rapport du run écrit dans {args.report}")
+    print(f"⏱️ Terminé en {round(time.time() - start, 2)} secondes")
+
 if __name__ == "__main__":
-        start = time.time()
-        run_etl()
-        print(f"⏱️ Terminé en {round(time.time() - start, 2)} secondes")
\ No newline at end of file
+    main()
@@ -1,13 +1,16 @@
 import pandas as pd
-import os
-import re
+
+from ETL_OMS import indicators, save_visual, visual_path_csv
 
 # Configuration
 FINAL_PATH = "./Résultat de l'ETL/final.csv"
-VISUAL_PATH = "./Résultat de l'ETL/visual.csv"
+VISUAL_PATH = visual_path_csv
+
+# ℹ️ ETL_OMS.run_etl produit déjà visual.csv depuis le DataFrame en mémoire ;
+# ce script ne sert plus qu'à regénérer visual.csv à partir d'un final.csv existant.
 
 # Lecture du fichier final long format
-df = pd.read_csv(FINAL_PATH)
+df = pd.read_csv(FINAL_PATH, dtype={"indicator": pd.CategoricalDtype(indicators), "unit": "category"})
 
 # Nettoyage basique : on s'assure que les dates soient bien des datetime
 if "date" in df.columns:
@@ -21,23 +24,6 @@ for col in colonnes_essentielles:
     if col not in df.columns:
         raise ValueError(f"Colonne manquante : {col}")
 
-# Pivot du format long vers format large : chaque ligne = 1 pays + 1 date + 1 pandémie
-pivot_df = df.pivot_table(
-    index=["date", "country", "pandemic"],
-    columns="indicator",
-    values="value",
-    aggfunc="first"
-).reset_index()
-
-# Nettoyage des noms de colonnes (supprimer l’attribut name de l’index pivoté)
-pivot_df.columns.name = None
-
-# Valeurs manquantes → 0 par défaut pour une visualisation complète
-pivot_df.fillna(0, inplace=True)
-
-# Export vers CSV visualisable directement dans Power BI
-os.makedirs(os.path.dirname(VISUAL_PATH), exist_ok=True)
-pivot_df.to_csv(VISUAL_PATH, index=False)
-
-print("✅ Fichier visual.csv généré avec succès dans :", VISUAL_PATH)
-print(pivot_df.head())
\ No newline at end of file
+# Format long → large (1 ligne = 1 pays + 1 date + 1 pandémie), export pour Power BI
+pivot_df = save_visual(df, VISUAL_PATH)
+print(pivot_df.head())
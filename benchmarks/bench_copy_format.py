@@ -0,0 +1,98 @@
+"""Compare le débit des formats COPY CSV et binaire sur les fichiers de DATASETS.
+
+Sans option, seul l'encodage côté Python est mesuré (aucune base requise).
+Avec --with-db, le flux est aussi envoyé dans temp_statistique via COPY.
+
+    python benchmarks/bench_copy_format.py [--repeat 5] [--with-db]
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ETL_OMS_OPERATIONNEL as etl
+from db_session import get_pool
+
+
+def build_bench_rows():
+    """Lignes statistique des DATASETS, avec des id_region attribués en mémoire."""
+    frames, _ = etl.load_frames(None)
+    countries = pd.unique(pd.concat([df["country"] for _, _, df in frames]))
+    region_dict = {c: i + 1 for i, c in enumerate(countries)}
+    maladies = {mal: i + 1 for i, mal in enumerate(dict.fromkeys(m for _, m, _ in frames))}
+    return pd.concat(
+        [etl.build_rows(df, maladies[mal], region_dict) for _, mal, df in frames],
+        ignore_index=True
+    )
+
+
+def drain(stream):
+    size = 0
+    while True:
+        data = stream.read(65536)
+        if not data:
+            return size
+        size += len(data)
+
+
+def bench_encoding(rows, copy_format, repeat):
+    best, size = None, 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = drain(etl.stream_rows(rows, copy_format))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, size
+
+
+def bench_copy(rows, copy_format, repeat):
+    best = None
+    with get_pool().connection() as conn, conn.cursor() as cur:
+        for _ in range(repeat):
+            stream = etl.stream_rows(rows, copy_format)
+            cur.execute("""
+                DROP TABLE IF EXISTS bench_statistique;
+                CREATE TEMP TABLE bench_statistique (
+                    id_region INTEGER, date DATE, id_maladie INTEGER, nouveau_mort INTEGER,
+                    nouveau_cas INTEGER, total_mort INTEGER, total_cas INTEGER
+                );
+            """)
+            options = "(FORMAT binary)" if copy_format == "binary" else "CSV"
+            start = time.perf_counter()
+            cur.copy_expert(
+                f"COPY bench_statistique({', '.join(etl.temp_statistique_columns)}) FROM STDIN WITH {options}",
+                stream
+            )
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        conn.rollback()
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark COPY CSV vs binaire")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--with-db", action="store_true", help="Mesure aussi le COPY réel vers PostgreSQL")
+    args = parser.parse_args()
+
+    built = build_bench_rows()
+    rows = etl.aggregate_rows(built)
+    nb_rows = len(rows)
+    print(f"\n📏 {len(built)} lignes construites, {nb_rows} après agrégation (id_region, date)")
+
+    for copy_format in etl.copy_formats:
+        elapsed, size = bench_encoding(rows, copy_format, args.repeat)
+        line = (f"{copy_format:>6} | encodage {elapsed:.3f}s | {nb_rows / elapsed:,.0f} lignes/s"
+                f" | {size / 1e6:.1f} Mo")
+        if args.with_db:
+            copy_elapsed = bench_copy(rows, copy_format, args.repeat)
+            line += f" | COPY {copy_elapsed:.3f}s ({nb_rows / copy_elapsed:,.0f} lignes/s)"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
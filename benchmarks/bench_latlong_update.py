@@ -0,0 +1,96 @@
+"""Compare la mise à jour des coordonnées GPS : UPDATE ... CASE (ancien) vs UPDATE ... FROM.
+
+Les régions sont générées dans une table temporaire `region` qui masque la table
+réelle le temps de la session (aucune donnée existante n'est modifiée, la
+transaction est annulée au retour de la connexion dans le pool). Sans --with-db,
+seule la taille de la requête CASE est calculée.
+
+    python benchmarks/bench_latlong_update.py [--regions 10000 50000] [--repeat 3] [--with-db]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from contextlib import ExitStack
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ETL_OMS_OPERATIONNEL as etl
+from db_session import get_pool
+
+
+def make_updates(nb_regions, seed=0):
+    rng = random.Random(seed)
+    return {i: (rng.uniform(-90, 90), rng.uniform(-180, 180)) for i in range(1, nb_regions + 1)}
+
+
+def case_update_query(latlong_updates):
+    """Ancienne requête : un CASE par colonne, valeurs interpolées dans le SQL."""
+    lat_cases = "\n".join(f"WHEN {id_} THEN {lat}" for id_, (lat, _) in latlong_updates.items())
+    long_cases = "\n".join(f"WHEN {id_} THEN {lon}" for id_, (_, lon) in latlong_updates.items())
+    ids = ",".join(map(str, latlong_updates))
+    return f"""
+        UPDATE region SET
+            latitude = CASE id_region
+                {lat_cases}
+            END,
+            longitude = CASE id_region
+                {long_cases}
+            END
+        WHERE id_region IN ({ids}) AND (latitude IS NULL OR longitude IS NULL)
+    """
+
+
+def reset_regions(cur, nb_regions):
+    cur.execute("""
+        DROP TABLE IF EXISTS pg_temp.region;
+        CREATE TEMP TABLE region (
+            id_region INTEGER PRIMARY KEY,
+            nom_region TEXT,
+            latitude DOUBLE PRECISION,
+            longitude DOUBLE PRECISION
+        );
+        INSERT INTO region(id_region, nom_region)
+        SELECT i, 'region_' || i FROM generate_series(1, %s) AS i;
+    """, (nb_regions,))
+
+
+def bench(cur, nb_regions, latlong_updates, method, repeat):
+    best = None
+    for _ in range(repeat):
+        reset_regions(cur, nb_regions)
+        start = time.perf_counter()
+        if method == "case":
+            cur.execute(case_update_query(latlong_updates))
+        else:
+            etl.update_region_coordinates(cur, latlong_updates)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark mise à jour latitude/longitude des régions")
+    parser.add_argument("--regions", type=int, nargs="+", default=[10_000, 50_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--with-db", action="store_true", help="Mesure les deux UPDATE sur PostgreSQL")
+    args = parser.parse_args()
+
+    with ExitStack() as stack:
+        cur = None
+        if args.with_db:
+            conn = stack.enter_context(get_pool().connection())
+            cur = stack.enter_context(conn.cursor())
+        for nb_regions in args.regions:
+            updates = make_updates(nb_regions)
+            line = f"{nb_regions:>7} régions | requête CASE {len(case_update_query(updates)) / 1e6:.1f} Mo"
+            if cur:
+                case_elapsed = bench(cur, nb_regions, updates, "case", args.repeat)
+                from_elapsed = bench(cur, nb_regions, updates, "from", args.repeat)
+                line += f" | CASE {case_elapsed:.3f}s | UPDATE ... FROM {from_elapsed:.3f}s"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
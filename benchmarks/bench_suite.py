@@ -0,0 +1,181 @@
+"""Banc de mesure de bout en bout sur des flux synthétiques (voir synthetic_feeds.py).
+
+Le pipeline mesuré est celui de production : run_etl(sink=...), dont les étapes
+sont enregistrées par etl_report (extract, mapping, date_parse, transform,
+dimension_resolve, row_build, latlong_update, load, copy, merge, commit...).
+La cible du chargement est interchangeable :
+
+- files    : FileSink dans un dossier temporaire, aucune base requise ;
+- postgres : PostgresSink sur une vraie base (variables ETL_DB_* / PG*), dans un
+             schéma jetable `etl_bench` placé en tête du search_path de toutes
+             les connexions du pool (PGOPTIONS) : les tables réelles ne sont
+             jamais modifiées, le chargement parallèle (--parallel) compris.
+
+Les résultats peuvent être enregistrés comme référence puis comparés :
+
+    python benchmarks/bench_suite.py --countries 200 --days 365 --save-baseline benchmarks/baseline.json
+    python benchmarks/bench_suite.py --countries 200 --days 365 --compare benchmarks/baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+from contextlib import contextmanager, nullcontext
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ETL_OMS_OPERATIONNEL as etl
+from db_session import close_pool, get_pool
+from etl_report import RunReport
+from synthetic_feeds import generate_feeds
+
+bench_schema = "etl_bench"
+bench_schema_ddl = f"""
+    DROP SCHEMA IF EXISTS {bench_schema} CASCADE;
+    CREATE SCHEMA {bench_schema};
+    CREATE TABLE {bench_schema}.maladie (id_maladie SERIAL PRIMARY KEY, nom_maladie TEXT UNIQUE);
+    CREATE TABLE {bench_schema}.pays (id_pays SERIAL PRIMARY KEY, nom_pays TEXT UNIQUE);
+    CREATE TABLE {bench_schema}.region (
+        id_region SERIAL PRIMARY KEY, nom_region TEXT UNIQUE, id_pays INTEGER,
+        latitude DOUBLE PRECISION, longitude DOUBLE PRECISION
+    );
+    CREATE TABLE {bench_schema}.statistique (
+        id_region INTEGER, date DATE, id_maladie INTEGER, nouveau_mort INTEGER,
+        nouveau_cas INTEGER, total_mort INTEGER, total_cas INTEGER,
+        PRIMARY KEY (id_region, date)
+    );
+"""
+
+
+@contextmanager
+def postgres_bench_schema():
+    """Schéma etl_bench recréé à vide pour une répétition, supprimé ensuite."""
+    with get_pool().connection() as conn, conn.cursor() as cur:
+        cur.execute(bench_schema_ddl)
+        conn.commit()
+    try:
+        yield
+    finally:
+        with get_pool().connection() as conn, conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA IF EXISTS {bench_schema} CASCADE")
+            conn.commit()
+
+
+def use_bench_schema():
+    # Doit précéder la création du pool : libpq lit PGOPTIONS à chaque connexion
+    options = os.environ.get("PGOPTIONS", "")
+    os.environ["PGOPTIONS"] = f"{options} -c search_path={bench_schema}".strip()
+
+
+def make_sink(args, folder):
+    if args.sink == "postgres":
+        return etl.PostgresSink(args.copy_format, args.parallel)
+    return etl.FileSink(folder, args.output_format)
+
+
+def run_once(args, folder):
+    """Un passage complet de run_etl ; renvoie son RunReport."""
+    setup = postgres_bench_schema() if args.sink == "postgres" else nullcontext()
+    with setup:
+        return etl.run_etl(
+            workers=args.workers, chunksize=args.chunksize,
+            report=RunReport(), sink=make_sink(args, folder)
+        )
+
+
+def best_of(reports):
+    """Meilleur temps par étape sur les répétitions (le moins bruité)."""
+    results = {}
+    for report in reports:
+        for name, totals in report.totals().items():
+            best = results.get(name)
+            if best is None or totals["seconds"] < best["seconds"]:
+                results[name] = dict(totals)
+    total = min(r.total_seconds for r in reports)
+    results["total"] = {"calls": 1, "seconds": total, "rows_in": 0, "rows_out": 0}
+    return results
+
+
+def print_results(results, baseline=None, tolerance=0.2, min_seconds=0.01):
+    regressions = []
+    print(f"\n{'étape':<18}{'secondes':>10}{'lignes/s':>14}{'référence':>12}{'écart':>9}")
+    for name, r in results.items():
+        rows = r["rows_out"] or r["rows_in"]
+        rate = f"{rows / r['seconds']:,.0f}" if rows and r["seconds"] else "-"
+        line = f"{name:<18}{r['seconds']:>10.3f}{rate:>14}"
+        ref = (baseline or {}).get(name)
+        if ref and ref["seconds"]:
+            delta = r["seconds"] / ref["seconds"] - 1
+            # Les étapes de quelques millisecondes sont trop bruitées pour être jugées
+            slower = r["seconds"] - ref["seconds"] > min_seconds
+            flag = " ⚠️" if delta > tolerance and slower else ""
+            line += f"{ref['seconds']:>12.3f}{delta:>+9.0%}{flag}"
+            if flag:
+                regressions.append(name)
+        print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de bout en bout sur flux synthétiques")
+    parser.add_argument("--countries", type=int, default=200)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--diseases", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--sink", choices=("files", "postgres"), default="files")
+    parser.add_argument("--copy-format", choices=etl.copy_formats, default="csv")
+    parser.add_argument("--parallel", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--chunksize", type=int, default=None)
+    parser.add_argument("--output-format", choices=etl.output_formats, default="csv")
+    parser.add_argument("--feeds", help="Dossier des flux (généré dans un dossier temporaire sinon)")
+    parser.add_argument("--save-baseline", metavar="FICHIER.json", help="Enregistre les résultats comme référence")
+    parser.add_argument("--compare", metavar="FICHIER.json", help="Compare à une référence enregistrée")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Écart relatif toléré avant de signaler une régression (0.2 = +20 %%)")
+    parser.add_argument("--min-seconds", type=float, default=0.01,
+                        help="Écart absolu minimal (s) pour signaler une régression")
+    args = parser.parse_args()
+
+    params = {k: getattr(args, k) for k in ("countries", "days", "diseases", "seed", "sink", "copy_format",
+                                            "parallel", "workers", "chunksize", "output_format")}
+    if args.sink == "postgres":
+        use_bench_schema()
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = args.feeds or os.path.join(tmp, "feeds")
+        written = generate_feeds(folder, args.countries, args.days, args.diseases, args.seed)
+        print(f"📝 {len(written)} fichiers, {sum(written.values())} lignes générées dans {folder}")
+        etl.datasets_folder = folder
+
+        try:
+            reports = [run_once(args, os.path.join(tmp, "out")) for _ in range(args.repeat)]
+        finally:
+            close_pool()
+    results = best_of(reports)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved["params"] != params:
+            print(f"⚠️ Paramètres différents de la référence : {saved['params']}")
+        baseline = saved["stages"]
+    regressions = print_results(results, baseline, args.tolerance, args.min_seconds)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({"params": params, "python": platform.python_version(),
+                       "pandas": pd.__version__, "stages": results}, f, indent=2)
+        print(f"💾 Référence enregistrée dans {args.save_baseline}")
+    if regressions:
+        print(f"❌ Régression au-delà de {args.tolerance:.0%} : {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
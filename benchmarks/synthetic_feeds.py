@@ -0,0 +1,120 @@
+"""Générateur de flux synthétiques aux formats des sources réelles.
+
+Pour chaque maladie : un fichier façon OWID (monkeypox_report.csv), un façon JHU
+(covid_global_3.csv, dates m/d/yy) et un instantané façon worldometer (avec la
+population, relue par load_population). Taille : pays × jours × maladies.
+
+    python benchmarks/synthetic_feeds.py OUT_DIR [--countries 200] [--days 365] [--diseases 2]
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+diseases_available = ("covid", "monkeypox", "ebola")
+who_regions = ("Africa", "Americas", "Eastern Mediterranean", "Europe", "South-East Asia", "Western Pacific")
+
+
+def country_names(nb_countries):
+    return np.array([f"Country {i:04d}" for i in range(nb_countries)], dtype=object)
+
+
+def daily_series(rng, nb_countries, nb_days, scale):
+    """Nouveaux cas/morts (pays × jours) et leurs cumuls."""
+    new_cases = rng.poisson(rng.uniform(0, scale, size=(nb_countries, 1)), size=(nb_countries, nb_days))
+    new_deaths = rng.binomial(new_cases, 0.02)
+    return new_cases, new_deaths, new_cases.cumsum(axis=1), new_deaths.cumsum(axis=1)
+
+
+def owid_frame(countries, dates, population, series):
+    new_cases, new_deaths, total_cases, total_deaths = series
+    nb_days = len(dates)
+    per_million = 1e6 / np.repeat(population, nb_days)
+    return pd.DataFrame({
+        "location": np.repeat(countries, nb_days),
+        "iso_code": np.repeat([f"C{i:04d}" for i in range(len(countries))], nb_days),
+        "date": np.tile(dates.strftime("%Y-%m-%d"), len(countries)),
+        "total_cases": total_cases.ravel().astype(float),
+        "total_deaths": total_deaths.ravel().astype(float),
+        "new_cases": new_cases.ravel().astype(float),
+        "new_deaths": new_deaths.ravel().astype(float),
+        "new_cases_per_million": (new_cases.ravel() * per_million).round(3),
+        "total_cases_per_million": (total_cases.ravel() * per_million).round(3),
+        "total_deaths_per_million": (total_deaths.ravel() * per_million).round(3),
+    })
+
+
+def jhu_frame(rng, countries, dates, series):
+    _, _, total_cases, total_deaths = series
+    nb_countries = len(countries)
+    recovered = (total_cases * 0.8).astype(int)
+    # Format JHU : une ligne par (jour, pays), dates m/d/yy
+    return pd.DataFrame({
+        "Province/State": "",
+        "Country/Region": np.tile(countries, len(dates)),
+        "Lat": np.tile(rng.uniform(-60, 70, nb_countries).round(4), len(dates)),
+        "Long": np.tile(rng.uniform(-180, 180, nb_countries).round(4), len(dates)),
+        "Date": np.repeat(dates.strftime("%m/%d/%y"), nb_countries),
+        "Confirmed": total_cases.T.ravel(),
+        "Deaths": total_deaths.T.ravel(),
+        "Recovered": recovered.T.ravel(),
+        "Active": (total_cases - total_deaths - recovered).T.ravel(),
+        "WHO Region": np.tile(rng.choice(who_regions, nb_countries), len(dates)),
+    })
+
+
+def worldometer_frame(rng, countries, population, series):
+    new_cases, new_deaths, total_cases, total_deaths = series
+    return pd.DataFrame({
+        "Country/Region": countries,
+        "Continent": rng.choice(("Africa", "Asia", "Europe", "North America", "South America"), len(countries)),
+        "Population": population,
+        "TotalCases": total_cases[:, -1],
+        "NewCases": new_cases[:, -1],
+        "TotalDeaths": total_deaths[:, -1],
+        "NewDeaths": new_deaths[:, -1],
+        "Tot Cases/1M pop": (total_cases[:, -1] * 1e6 / population).round(),
+        "Deaths/1M pop": (total_deaths[:, -1] * 1e6 / population).round(),
+        "WHO Region": rng.choice(who_regions, len(countries)),
+    })
+
+
+def generate_feeds(folder, countries=200, days=365, diseases=2, seed=0, start="2020-01-22"):
+    """Écrit les fichiers synthétiques dans `folder` ; renvoie {fichier: nb lignes}."""
+    os.makedirs(folder, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    names = country_names(countries)
+    dates = pd.date_range(start, periods=days, freq="D")
+    population = rng.integers(100_000, 200_000_000, size=countries)
+
+    written = {}
+    for disease in diseases_available[:diseases]:
+        series = daily_series(rng, countries, days, scale=500 if disease == "covid" else 20)
+        for suffix, df in (
+            ("report", owid_frame(names, dates, population, series)),
+            ("global", jhu_frame(rng, names, dates, series)),
+            ("worldometer_data", worldometer_frame(rng, names, population, series)),
+        ):
+            fn = f"{disease}_{suffix}.csv"
+            df.to_csv(os.path.join(folder, fn), index=False)
+            written[fn] = len(df)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Génère des flux OWID / JHU / worldometer synthétiques")
+    parser.add_argument("folder")
+    parser.add_argument("--countries", type=int, default=200)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--diseases", type=int, default=2, choices=range(1, len(diseases_available) + 1))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    written = generate_feeds(args.folder, args.countries, args.days, args.diseases, args.seed)
+    for fn, nb_rows in written.items():
+        print(f"📝 {fn} : {nb_rows} lignes")
+
+
+if __name__ == "__main__":
+    main()
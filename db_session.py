@@ -0,0 +1,146 @@
+import os
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+from psycopg2.pool import ThreadedConnectionPool
+
+# Paramètres de connexion lus dans l'environnement (ETL_DB_*). Ceux non définis
+# sont laissés à libpq, qui lit alors PGHOST, PGPORT, PGDATABASE, PGUSER,
+# PGPASSWORD, PGSSLMODE...
+env_params = {
+    "dbname": "ETL_DB_NAME",
+    "user": "ETL_DB_USER",
+    "password": "ETL_DB_PASSWORD",
+    "host": "ETL_DB_HOST",
+    "port": "ETL_DB_PORT",
+    "sslmode": "ETL_DB_SSLMODE",
+}
+default_pool_size = 4
+
+
+def connection_params_from_env(environ=None):
+    environ = os.environ if environ is None else environ
+    return {key: environ[var] for key, var in env_params.items() if environ.get(var)}
+
+
+class SessionPool:
+    """Pool de connexions psycopg2 partagé par tout le run.
+
+    Les connexions sont ouvertes à la demande puis réutilisées d'un emprunt à
+    l'autre (pas de nouvelle poignée de main TLS). Quand toutes sont prises,
+    `connection()` attend qu'une se libère au lieu de lever PoolError ; le temps
+    d'attente et la part de connexions réutilisées sont exposés par `stats()`.
+    """
+
+    def __init__(self, params=None, maxconn=None):
+        self.params = connection_params_from_env() if params is None else params
+        self.maxconn = maxconn or int(os.environ.get("ETL_DB_POOL_MAX", default_pool_size))
+        self._pool = None
+        self._seen = weakref.WeakSet()
+        self._in_use = 0
+        self._available = threading.Condition()
+        self.checkouts = 0
+        self.hits = 0
+        self.misses = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.peak_in_use = 0
+
+    def ensure_capacity(self, maxconn):
+        """Agrandit le pool (ex. une connexion par paquet du chargement parallèle)."""
+        with self._available:
+            if maxconn > self.maxconn:
+                self.maxconn = maxconn
+                if self._pool is not None:
+                    self._pool.minconn = self._pool.maxconn = maxconn
+                self._available.notify_all()
+
+    @contextmanager
+    def connection(self):
+        """Emprunte une connexion ; elle est rendue (et annulée si une transaction
+        reste ouverte) à la sortie du bloc. Le commit reste à la charge de l'appelant."""
+        start = time.perf_counter()
+        with self._available:
+            while self._in_use >= self.maxconn:
+                self._available.wait()
+            self._in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self._in_use)
+            if self._pool is None:
+                # Aucune connexion ouverte d'avance ; minconn = maxconn ensuite pour
+                # que putconn garde les connexions rendues au lieu de les fermer
+                self._pool = ThreadedConnectionPool(0, self.maxconn, **self.params)
+                self._pool.minconn = self.maxconn
+        wait = time.perf_counter() - start
+        try:
+            conn = self._pool.getconn()
+        except Exception:
+            self._release()
+            raise
+
+        with self._available:
+            self.checkouts += 1
+            self.wait_seconds += wait
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+            if conn in self._seen:
+                self.hits += 1
+            else:
+                self.misses += 1
+                self._seen.add(conn)
+        try:
+            yield conn
+        finally:
+            try:
+                self._pool.putconn(conn)
+            except Exception:
+                # Connexion impossible à remettre en état (ex. transaction deux phases) : fermée
+                self._pool.putconn(conn, close=True)
+            self._release()
+
+    def _release(self):
+        with self._available:
+            self._in_use -= 1
+            self._available.notify()
+
+    def stats(self):
+        return {
+            "checkouts": self.checkouts,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / self.checkouts if self.checkouts else 0.0,
+            "wait_seconds": round(self.wait_seconds, 6),
+            "max_wait_seconds": round(self.max_wait_seconds, 6),
+            "peak_in_use": self.peak_in_use,
+            "maxconn": self.maxconn,
+        }
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.closeall()
+            self._pool = None
+            self._seen.clear()
+
+
+_default_pool = None
+_default_lock = threading.Lock()
+
+
+def get_pool(maxconn=None):
+    """Pool partagé du processus, créé au premier appel."""
+    global _default_pool
+    with _default_lock:
+        if _default_pool is None:
+            _default_pool = SessionPool()
+        pool = _default_pool
+    if maxconn:
+        pool.ensure_capacity(maxconn)
+    return pool
+
+
+def close_pool():
+    global _default_pool
+    with _default_lock:
+        if _default_pool is not None:
+            _default_pool.close()
+            _default_pool = None
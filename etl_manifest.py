@@ -0,0 +1,135 @@
+import hashlib
+import os
+import sqlite3
+
+import pandas as pd
+
+# Manifeste local des chargements incrémentaux (fichiers sources + lignes chargées)
+manifest_path = ".etl_manifest.sqlite"
+
+stat_columns = [
+    "id_region", "date", "id_maladie", "nouveau_mort", "nouveau_cas",
+    "total_mort", "total_cas"
+]
+value_columns = ["id_maladie", "nouveau_mort", "nouveau_cas", "total_mort", "total_cas"]
+
+
+def file_sha256(path, block_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class Manifest:
+    """Mémorise, par fichier source, sa taille, son mtime, son hash et les lignes
+    statistique (agrégées par (id_region, date)) issues du dernier chargement."""
+
+    def __init__(self, path=None):
+        self.path = path or manifest_path
+        self.conn = sqlite3.connect(self.path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER,
+                mtime REAL,
+                sha256 TEXT
+            );
+            CREATE TABLE IF NOT EXISTS rows (
+                source TEXT,
+                id_region INTEGER,
+                date TEXT,
+                id_maladie INTEGER,
+                nouveau_mort INTEGER,
+                nouveau_cas INTEGER,
+                total_mort INTEGER,
+                total_cas INTEGER,
+                PRIMARY KEY (source, id_region, date)
+            );
+        """)
+        self._hashes = {}
+
+    def close(self):
+        self.conn.close()
+
+    def sha256(self, path):
+        if path not in self._hashes:
+            self._hashes[path] = file_sha256(path)
+        return self._hashes[path]
+
+    def is_unchanged(self, path):
+        """Vrai si le fichier est identique au dernier chargement enregistré.
+
+        Taille + mtime identiques suffisent ; sinon on compare le hash du contenu
+        (un simple `touch` ne force donc pas de rechargement).
+        """
+        row = self.conn.execute("SELECT size, mtime, sha256 FROM files WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return False
+        stat = os.stat(path)
+        if row[0] == stat.st_size and row[1] == stat.st_mtime:
+            return True
+        if row[0] == stat.st_size and row[2] == self.sha256(path):
+            self.conn.execute("UPDATE files SET mtime = ? WHERE path = ?", (stat.st_mtime, path))
+            self.conn.commit()
+            return True
+        return False
+
+    def previous_rows(self, source):
+        return self._read_rows("SELECT * FROM rows WHERE source = ?", (source,))
+
+    def rows_for_keys(self, keys, exclude_sources=()):
+        """Lignes des autres fichiers pour les clés (id_region, date) de `keys`."""
+        self.conn.execute("DROP TABLE IF EXISTS temp.keys")
+        self.conn.execute("CREATE TEMP TABLE keys (id_region INTEGER, date TEXT)")
+        self.conn.executemany(
+            "INSERT INTO temp.keys VALUES (?, ?)",
+            zip(keys["id_region"].astype("int64").tolist(), keys["date"].dt.strftime("%Y-%m-%d"))
+        )
+        placeholders = ",".join("?" * len(exclude_sources))
+        query = """
+            SELECT r.* FROM rows r
+            JOIN temp.keys k ON r.id_region = k.id_region AND r.date = k.date
+        """
+        if exclude_sources:
+            query += f" WHERE r.source NOT IN ({placeholders})"
+        return self._read_rows(query + " ORDER BY r.source", tuple(exclude_sources))
+
+    def record(self, path, rows):
+        """Enregistre l'état du fichier et ses lignes agrégées après un chargement réussi."""
+        stat = os.stat(path)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO files(path, size, mtime, sha256) VALUES (?, ?, ?, ?)",
+            (path, stat.st_size, stat.st_mtime, self.sha256(path))
+        )
+        self.conn.execute("DELETE FROM rows WHERE source = ?", (path,))
+        data = rows[stat_columns].assign(date=rows["date"].dt.strftime("%Y-%m-%d"))
+        self.conn.executemany(
+            f"INSERT INTO rows(source, {', '.join(stat_columns)}) VALUES (?, {', '.join('?' * len(stat_columns))})",
+            ((path, *map(_to_python, values)) for values in data.itertuples(index=False))
+        )
+
+    def commit(self):
+        self.conn.commit()
+
+    def _read_rows(self, query, params):
+        df = pd.read_sql_query(query, self.conn, params=params)
+        df["date"] = pd.to_datetime(df["date"])
+        return df
+
+
+def _to_python(value):
+    return value.item() if hasattr(value, "item") else value
+
+
+def changed_keys(current, previous):
+    """Clés (id_region, date) ajoutées, modifiées ou disparues entre deux états d'un fichier."""
+    keys = ["id_region", "date"]
+    merged = current[keys + value_columns].merge(
+        previous[keys + value_columns], on=keys, how="outer", suffixes=("", "_prev"), indicator=True
+    )
+    differs = merged["_merge"] != "both"
+    for col in value_columns:
+        differs |= merged[col] != merged[f"{col}_prev"]
+    return merged.loc[differs, keys].reset_index(drop=True)
@@ -0,0 +1,80 @@
+import re
+from collections import namedtuple
+
+_non_alnum = re.compile(r"[^a-z0-9]+")
+
+# Mot-clé du nom de fichier → maladie (partagé par les différents ETL)
+maladies_mapping = {
+    "covid": "COVID-19", "coronavirus": "COVID-19", "covid19": "COVID-19",
+    "monkeypox": "Monkeypox", "mpox": "Monkeypox",
+    "ebola": "Ebola Virus Disease"
+}
+
+# mapping : {colonne source: colonne standard} ; unmatched : colonnes source non reconnues
+MappingResult = namedtuple("MappingResult", ["mapping", "unmatched"])
+
+
+def normalize_column_name(col):
+    return _non_alnum.sub("_", str(col).strip().lower())
+
+
+def detect_maladie(fname):
+    n = fname.lower()
+    for k, v in maladies_mapping.items():
+        if k in n:
+            return v
+    return "Inconnue"
+
+
+class ColumnMapper:
+    """Moteur de mapping des colonnes hétérogènes vers nos colonnes standard.
+
+    L'index synonyme normalisé → (colonne standard, rang) est construit une seule
+    fois ; le mapping résolu est mis en cache par signature d'en-tête (tuple des
+    noms de colonnes), les flux aux en-têtes identiques ne sont donc résolus
+    qu'une fois. Pour chaque colonne standard, le premier synonyme présent
+    (dans l'ordre de la liste) l'emporte, comme dans l'ancien parcours.
+    """
+
+    def __init__(self, synonyms):
+        self.standard_columns = list(synonyms)
+        self.index = {}
+        for std_col, candidates in synonyms.items():
+            for rank, candidate in enumerate(candidates):
+                self.index.setdefault(normalize_column_name(candidate), []).append((std_col, rank))
+        self._cache = {}
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, columns):
+        signature = tuple(columns)
+        result = self._cache.get(signature)
+        if result is not None:
+            self.hits += 1
+            return result
+        self.misses += 1
+
+        normalized_cols = {normalize_column_name(c): c for c in signature}
+        best = {}
+        for norm, col in normalized_cols.items():
+            for std_col, rank in self.index.get(norm, ()):
+                if std_col not in best or rank < best[std_col][0]:
+                    best[std_col] = (rank, col)
+
+        mapping = {}
+        for std_col in self.standard_columns:
+            if std_col in best:
+                mapping[best[std_col][1]] = std_col
+        unmatched = [c for c in signature if c not in mapping]
+
+        result = MappingResult(mapping, unmatched)
+        self._cache[signature] = result
+        return result
+
+    def rename(self, df):
+        """Renvoie (df renommé, colonnes non reconnues)."""
+        result = self.resolve(df.columns)
+        return df.rename(columns=result.mapping), result.unmatched
+
+    def stats(self):
+        return {"signatures": len(self._cache), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,121 @@
+import gzip
+import importlib.util
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Écriture des tables de résultats : CSV, JSON (tableau de records) et NDJSON,
+# sérialisés par blocs et, si demandé, compressés (gzip, ou zstd si installé) ;
+# Parquet (pyarrow) compresse ses pages lui-même, sans suffixe de fichier
+output_formats = ("csv", "json", "ndjson", "parquet")
+compressions = {None: "", "gzip": ".gz", "zstd": ".zst"}
+zstd_available = importlib.util.find_spec("zstandard") is not None
+default_chunksize = 100_000
+
+
+def parse_formats(value):
+    """"csv,json" → ("csv", "json") ; lève ValueError sur un format inconnu."""
+    formats = tuple(f.strip().lower() for f in value.split(",") if f.strip())
+    unknown = [f for f in formats if f not in output_formats]
+    if unknown or not formats:
+        raise ValueError(f"Format(s) de sortie inconnu(s) : {unknown or value} (choix : {', '.join(output_formats)})")
+    return formats
+
+
+def open_text(path, compression=None, append=False):
+    """Fichier texte en écriture ; en ajout, un flux compressé reçoit un nouveau
+    membre gzip / une nouvelle trame zstd, relus à la suite par les lecteurs."""
+    mode = "a" if append else "w"
+    if compression is None:
+        return open(path, mode, encoding="utf-8", newline="")
+    if compression == "gzip":
+        return gzip.open(path, mode + "t", encoding="utf-8", newline="")
+    if compression == "zstd":
+        if not zstd_available:
+            raise RuntimeError("zstandard est requis pour la compression zstd (pip install zstandard)")
+        import zstandard
+        return zstandard.open(path, mode + "t", encoding="utf-8", newline="")
+    raise ValueError(f"Compression inconnue : {compression}")
+
+
+def iter_chunks(df, chunksize):
+    for start in range(0, len(df), chunksize):
+        yield df.iloc[start:start + chunksize]
+
+
+def write_csv(df, path, compression=None, chunksize=default_chunksize, append=False):
+    # En ajout, l'en-tête n'est écrit que si le fichier est nouveau
+    header = not (append and os.path.exists(path) and os.path.getsize(path) > 0)
+    with open_text(path, compression, append) as f:
+        df.to_csv(f, index=False, header=header, chunksize=chunksize)
+    return path
+
+
+def write_ndjson(df, path, compression=None, chunksize=default_chunksize, append=False):
+    """Un record JSON par ligne, sérialisé bloc par bloc (mémoire bornée au bloc)."""
+    with open_text(path, compression, append) as f:
+        for chunk in iter_chunks(df, chunksize):
+            f.write(chunk.to_json(orient="records", lines=True, date_format="iso").rstrip("\n"))
+            f.write("\n")
+    return path
+
+
+def write_json(df, path, compression=None, chunksize=default_chunksize, append=False):
+    """Même sortie que to_json(orient="records"), mais écrite bloc par bloc."""
+    if append:
+        raise ValueError("Un tableau JSON ne peut pas être complété : utiliser le format ndjson")
+    with open_text(path, compression) as f:
+        f.write("[")
+        first = True
+        for chunk in iter_chunks(df, chunksize):
+            # Chaque bloc est un tableau "[...]" : on n'en garde que le contenu
+            records = chunk.to_json(orient="records", date_format="iso")[1:-1]
+            if records:
+                f.write(records if first else "," + records)
+                first = False
+        f.write("]")
+    return path
+
+
+def write_parquet(df, path, compression=None, chunksize=default_chunksize, append=False):
+    """Fichier Parquet, un groupe de lignes par bloc ; la compression est interne."""
+    if append:
+        raise ValueError("Un fichier Parquet ne peut pas être complété : utiliser le format csv ou ndjson")
+    df.to_parquet(path, index=False, compression=compression or "snappy", row_group_size=chunksize)
+    return path
+
+
+writers = {"csv": write_csv, "json": write_json, "ndjson": write_ndjson, "parquet": write_parquet}
+
+
+def table_path(base_path, fmt, compression=None):
+    suffix = "" if fmt == "parquet" else compressions[compression]
+    return f"{base_path}.{fmt}{suffix}"
+
+
+def appendable(formats):
+    """Formats utilisables en ajout : json (tableau) est remplacé par ndjson."""
+    return tuple(dict.fromkeys("ndjson" if fmt == "json" else fmt for fmt in formats))
+
+
+def write_table(df, base_path, formats=("csv", "json"), compression=None, chunksize=default_chunksize,
+                append=False):
+    """Écrit `df` dans `base_path`.<format>[.gz|.zst] pour chaque format demandé.
+
+    Les formats sont écrits en parallèle (un thread par format) ; renvoie les
+    chemins écrits dans l'ordre de `formats`. Avec `append`, les lignes sont
+    ajoutées aux fichiers existants (csv et ndjson uniquement).
+    """
+    if compression not in compressions:
+        raise ValueError(f"Compression inconnue : {compression}")
+    folder = os.path.dirname(base_path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    paths = [table_path(base_path, fmt, compression) for fmt in formats]
+    if len(formats) == 1:
+        return [writers[formats[0]](df, paths[0], compression, chunksize, append)]
+    with ThreadPoolExecutor(max_workers=len(formats)) as executor:
+        futures = [
+            executor.submit(writers[fmt], df, path, compression, chunksize, append)
+            for fmt, path in zip(formats, paths)
+        ]
+        return [future.result() for future in futures]
@@ -0,0 +1,168 @@
+import contextvars
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_current_file = contextvars.ContextVar("etl_report_file", default=None)
+_active = None
+
+
+def peak_rss_mb():
+    """Pic de mémoire résidente du processus (Mo), None si indisponible."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss est en Ko sous Linux, en octets sous macOS
+    return round(peak / (1 << 20 if sys.platform == "darwin" else 1 << 10), 1)
+
+
+class RunReport:
+    """Mesures d'un run, agrégées par (fichier, étape).
+
+    Pour chaque couple : nombre d'appels, temps mural cumulé, lignes en entrée
+    et en sortie, octets lus et pic RSS observé. Les étapes peuvent s'imbriquer
+    (ex. `transform` inclut `mapping` et `date_parse`).
+    """
+
+    def __init__(self):
+        self.started_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self._start = time.perf_counter()
+        self.total_seconds = None
+        self.records = {}
+        self.extra = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, file, seconds, rows_in=None, rows_out=None, bytes_read=None, calls=1, peak_rss=None):
+        peak_rss = peak_rss_mb() if peak_rss is None else peak_rss
+        with self._lock:
+            record = self.records.setdefault((file, name), {
+                "file": file, "stage": name, "calls": 0, "seconds": 0.0,
+                "rows_in": None, "rows_out": None, "bytes_read": None, "peak_rss_mb": None,
+            })
+            record["calls"] += calls
+            record["seconds"] += seconds
+            for key, value in (("rows_in", rows_in), ("rows_out", rows_out), ("bytes_read", bytes_read)):
+                if value is not None:
+                    record[key] = (record[key] or 0) + int(value)
+            if peak_rss is not None:
+                record["peak_rss_mb"] = max(record["peak_rss_mb"] or 0, peak_rss)
+
+    def merge(self, records):
+        """Ajoute les mesures d'un autre processus (ex. worker d'extraction)."""
+        for r in records:
+            self.add(r["stage"], r["file"], r["seconds"], r["rows_in"], r["rows_out"],
+                     r["bytes_read"], r["calls"], r["peak_rss_mb"])
+
+    def stages(self):
+        return [dict(r, seconds=round(r["seconds"], 6)) for r in self.records.values()]
+
+    def totals(self):
+        """Temps et lignes cumulés par étape, tous fichiers confondus."""
+        totals = {}
+        for r in self.records.values():
+            t = totals.setdefault(r["stage"], {"calls": 0, "seconds": 0.0, "rows_in": 0, "rows_out": 0})
+            t["calls"] += r["calls"]
+            t["seconds"] = round(t["seconds"] + r["seconds"], 6)
+            t["rows_in"] += r["rows_in"] or 0
+            t["rows_out"] += r["rows_out"] or 0
+        return totals
+
+    def finish(self):
+        self.total_seconds = round(time.perf_counter() - self._start, 6)
+
+    def to_dict(self):
+        return {
+            "started_at": self.started_at,
+            "total_seconds": self.total_seconds,
+            "peak_rss_mb": peak_rss_mb(),
+            "totals": self.totals(),
+            "stages": self.stages(),
+            **self.extra,
+        }
+
+    def write_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False, default=str)
+
+
+@contextmanager
+def activate(report):
+    """Rend `report` actif : les `stage()` exécutés dans le bloc y sont enregistrés."""
+    global _active
+    previous, _active = _active, report
+    try:
+        yield report
+    finally:
+        _active = previous
+
+
+def active_report():
+    return _active
+
+
+@contextmanager
+def file_context(fn):
+    """Rattache les étapes du bloc au fichier source `fn`."""
+    token = _current_file.set(fn)
+    try:
+        yield
+    finally:
+        _current_file.reset(token)
+
+
+@contextmanager
+def stage(name, rows_in=None, bytes_read=None):
+    """Mesure une étape dans le rapport actif (sans rapport actif, ne mesure rien).
+
+    Le dict renvoyé peut être complété dans le bloc (`rows_out`, `rows_in`...).
+    """
+    record = {"rows_in": rows_in, "rows_out": None, "bytes_read": bytes_read}
+    report = _active
+    if report is None:
+        yield record
+        return
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        report.add(name, _current_file.get(), time.perf_counter() - start, **record)
+
+
+@contextmanager
+def profiling(report, profile_path=None, trace_memory=False, top=15):
+    """Active cProfile (stats écrites dans `profile_path`) et/ou tracemalloc
+    (pic et principales allocations ajoutés au rapport) autour du bloc."""
+    profiler = None
+    if profile_path:
+        import cProfile
+        profiler = cProfile.Profile()
+    if trace_memory:
+        import tracemalloc
+        tracemalloc.start()
+    if profiler:
+        profiler.enable()
+    try:
+        yield report
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+            report.extra["profile"] = profile_path
+        if trace_memory:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            report.extra["tracemalloc"] = {
+                "peak_mb": round(peak / (1 << 20), 1),
+                "top": [
+                    {"where": str(s.traceback), "size_kb": round(s.size / 1024, 1), "count": s.count}
+                    for s in snapshot.statistics("lineno")[:top]
+                ],
+            }
@@ -0,0 +1,88 @@
+import importlib.util
+import json
+import os
+
+from etl_manifest import file_sha256
+
+# Cache colonnaire (Arrow IPC / Feather) des fichiers transformés, entre transform et load
+staging_folder = ".etl_staging"
+arrow_available = importlib.util.find_spec("pyarrow") is not None
+
+
+class StagingCache:
+    """Frames transformées par fichier source, en Arrow IPC lisible par memory-map.
+
+    Chaque frame est rangée sous le hash SHA-256 de son fichier source ; un index
+    JSON associe nom de fichier → (hash, maladie, fichier Arrow ou None si le
+    fichier a été ignoré à la transformation).
+    """
+
+    def __init__(self, folder=None):
+        if not arrow_available:
+            raise RuntimeError("pyarrow est requis pour le cache de staging (pip install pyarrow)")
+        self.folder = folder or staging_folder
+        os.makedirs(self.folder, exist_ok=True)
+        self.index_path = os.path.join(self.folder, "index.json")
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding="utf-8") as f:
+                self.index = json.load(f)
+        self._hashes = {}
+
+    def sha256(self, path):
+        if path not in self._hashes:
+            self._hashes[path] = file_sha256(path)
+        return self._hashes[path]
+
+    def split(self, files):
+        """Sépare les fichiers déjà en cache (même contenu) de ceux à transformer.
+
+        Renvoie (frames en cache, fichiers ignorés en cache, fichiers à traiter).
+        """
+        frames, ignored, to_process = [], [], []
+        for fn, path in files:
+            entry = self.index.get(fn)
+            if entry is None or entry["sha256"] != self.sha256(path):
+                to_process.append((fn, path))
+            elif entry["file"] is None:
+                ignored.append(fn)
+            else:
+                frames.append((fn, entry["maladie"], self._read(entry["file"])))
+        return frames, ignored, to_process
+
+    def put(self, fn, path, maladie, df):
+        sha = self.sha256(path)
+        entry = {"sha256": sha, "maladie": maladie, "file": None}
+        if df is not None:
+            entry["file"] = f"{sha}.arrow"
+            df.reset_index(drop=True).to_feather(os.path.join(self.folder, entry["file"]))
+        previous = self.index.get(fn)
+        self.index[fn] = entry
+        if previous is not None and previous["file"] not in (None, entry["file"]):
+            self._discard(previous["file"])
+
+    def _discard(self, name):
+        # Le même contenu peut être indexé sous plusieurs noms : ne supprimer
+        # le fichier Arrow que s'il n'est plus référencé
+        if all(entry["file"] != name for entry in self.index.values()):
+            path = os.path.join(self.folder, name)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def load_all(self):
+        """Toutes les frames de l'index (relance load-only, sans lire DATASETS)."""
+        frames = [
+            (fn, entry["maladie"], self._read(entry["file"]))
+            for fn, entry in sorted(self.index.items()) if entry["file"] is not None
+        ]
+        ignored = [fn for fn, entry in sorted(self.index.items()) if entry["file"] is None]
+        return frames, ignored
+
+    def save(self):
+        with open(self.index_path, "w", encoding="utf-8") as f:
+            json.dump(self.index, f, indent=2)
+
+    def _read(self, name):
+        from pyarrow import feather
+        # Lecture par memory-map : pas de copie du fichier en mémoire avant conversion
+        return feather.read_table(os.path.join(self.folder, name), memory_map=True).to_pandas()
@@ -1,31 +1,169 @@
+import hashlib
 import os
-from transformers import pipeline, AutoTokenizer, AutoModelForCausalLM
-import torch
+import sqlite3
+import threading
+import time
+
+# Configuration (surchargée par les variables ETL_LLM_*)
+model_path = os.environ.get("ETL_LLM_MODEL_PATH", "ETL_IA/Mistral")
+default_max_new_tokens = int(os.environ.get("ETL_LLM_MAX_NEW_TOKENS", 512))
+default_batch_size = int(os.environ.get("ETL_LLM_BATCH_SIZE", 8))
+# Cache des réponses ("" pour le désactiver)
+cache_path = os.environ.get("ETL_LLM_CACHE", ".llm_cache.sqlite")
+cache_max_entries = int(os.environ.get("ETL_LLM_CACHE_MAX", 10_000))
+
+
+class ResponseCache:
+    """Cache LRU sur disque (SQLite) : clé = hash(modèle, paramètres, prompt).
+
+    Un prompt déjà posé (ex. mapping de colonnes pour un même en-tête) est servi
+    sans relancer le modèle ; au-delà de `max_entries`, les réponses les moins
+    récemment lues sont supprimées.
+    """
+
+    def __init__(self, path=None, max_entries=None):
+        self.path = path or cache_path
+        self.max_entries = max_entries or cache_max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model, prompt, **params):
+        raw = "\x1f".join([model, prompt] + [f"{k}={params[k]}" for k in sorted(params)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get_many(self, keys):
+        """{clé: réponse} pour les clés présentes (et marquées comme récemment lues)."""
+        if not keys:
+            return {}
+        with self._lock:
+            found = {}
+            unique = list(dict.fromkeys(keys))
+            for start in range(0, len(unique), 500):  # limite de paramètres SQLite
+                batch = unique[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, response FROM responses WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                found.update(rows)
+            now = time.time()
+            self._conn.executemany("UPDATE responses SET last_used = ? WHERE key = ?", [(now, k) for k in found])
+            self._conn.commit()
+            self.hits += sum(k in found for k in keys)
+            self.misses += sum(k not in found for k in keys)
+            return found
+
+    def put_many(self, items):
+        with self._lock:
+            now = time.time()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO responses (key, response, last_used) VALUES (?, ?, ?)",
+                [(k, v, now) for k, v in items.items()]
+            )
+            self._conn.execute("""
+                DELETE FROM responses WHERE key IN (
+                    SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
 
 # 👇 Classe de base abstraite
 class LLMClient:
-    def ask(self, prompt: str) -> str:
-        raise NotImplementedError("Méthode 'ask' non implémentée.")
+    """Client LLM ; les sous-classes implémentent `generate` (un lot de prompts).
+
+    `ask` et `ask_batch` passent par le cache de réponses s'il est fourni.
+    """
+
+    name = "llm"
+
+    def __init__(self, cache=None, max_new_tokens=None):
+        self.cache = cache
+        self.max_new_tokens = max_new_tokens or default_max_new_tokens
+
+    def generate(self, prompts, max_new_tokens):
+        raise NotImplementedError("Méthode 'generate' non implémentée.")
+
+    def ask(self, prompt: str, max_new_tokens=None) -> str:
+        return self.ask_batch([prompt], max_new_tokens)[0]
+
+    def ask_batch(self, prompts, max_new_tokens=None):
+        """Réponses dans l'ordre de `prompts` ; seuls les prompts absents du cache
+        (dédoublonnés) sont envoyés au modèle, en un seul lot."""
+        max_new_tokens = max_new_tokens or self.max_new_tokens
+        if self.cache is None:
+            missing = list(dict.fromkeys(prompts))
+            answers = dict(zip(missing, self.generate(missing, max_new_tokens)))
+            return [answers[p] for p in prompts]
+
+        keys = {p: self.cache.key(self.name, p, max_new_tokens=max_new_tokens) for p in prompts}
+        cached = self.cache.get_many(list(keys.values()))
+        missing = [p for p in dict.fromkeys(prompts) if keys[p] not in cached]
+        if missing:
+            generated = dict(zip(missing, self.generate(missing, max_new_tokens)))
+            self.cache.put_many({keys[p]: generated[p] for p in missing})
+            cached.update((keys[p], generated[p]) for p in missing)
+        return [cached[keys[p]] for p in prompts]
 
 
 class LocalLLMClient(LLMClient):
-    def __init__(self):
-        model_path = "ETL_IA/Mistral"  # ou "ETL_IA/Mistral"
+    """Modèle local (Mistral) servi par un pipeline transformers.
+
+    Sur GPU : poids fp16 répartis par device_map ; sans GPU : float32 sur CPU,
+    où le fp16 est lent ou non supporté.
+    """
 
-        os.makedirs("offload", exist_ok=True)
+    def __init__(self, path=None, cache=None, max_new_tokens=None, batch_size=None):
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
+
+        self.path = path or model_path
+        self.name = f"local:{self.path}"
+        super().__init__(cache, max_new_tokens)
+        self.batch_size = batch_size or default_batch_size
 
         tokenizer = AutoTokenizer.from_pretrained(
-            model_path,
+            self.path,
             local_files_only=True
         )
+        # Génération par lots : padding à gauche, Mistral n'a pas de pad_token
+        tokenizer.padding_side = "left"
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
 
-        model = AutoModelForCausalLM.from_pretrained(
-            model_path,
-            torch_dtype=torch.float16,
-            device_map="auto",
-            offload_folder="offload",
-            local_files_only=True
-        )
+        if torch.cuda.is_available():
+            os.makedirs("offload", exist_ok=True)
+            model = AutoModelForCausalLM.from_pretrained(
+                self.path,
+                torch_dtype=torch.float16,
+                device_map="auto",
+                offload_folder="offload",
+                local_files_only=True
+            )
+        else:
+            model = AutoModelForCausalLM.from_pretrained(
+                self.path,
+                torch_dtype=torch.float32,
+                local_files_only=True
+            )
+        model.eval()
 
         self.pipeline = pipeline(
             "text-generation",
@@ -33,9 +171,50 @@ class LocalLLMClient(LLMClient):
             tokenizer=tokenizer
         )
 
-    def ask(self, prompt: str) -> str:
-        return self.pipeline(prompt, max_new_tokens=512)[0]["generated_text"]
+    def generate(self, prompts, max_new_tokens):
+        outputs = self.pipeline(
+            prompts,
+            max_new_tokens=max_new_tokens,
+            batch_size=self.batch_size,
+            pad_token_id=self.pipeline.tokenizer.pad_token_id
+        )
+        return [out[0]["generated_text"] for out in outputs]
+
+
+# Sources disponibles : nom → fabrique (appelée une seule fois par processus)
+llm_sources = {"local": LocalLLMClient}
+_clients = {}
+_registry_lock = threading.Lock()
+_cache = None
+
+
+def get_response_cache():
+    """Cache de réponses partagé par tous les clients (None si désactivé)."""
+    global _cache
+    if _cache is None and cache_path:
+        _cache = ResponseCache(cache_path)
+    return _cache
 
 
 def get_llm_client(source="local") -> LLMClient:
-    return LocalLLMClient()
+    """Client de `source`, construit au premier appel puis réutilisé (le modèle
+    n'est chargé qu'une fois par processus)."""
+    client = _clients.get(source)
+    if client is not None:
+        return client
+    with _registry_lock:
+        if source not in _clients:
+            if source not in llm_sources:
+                raise ValueError(f"Source LLM inconnue : {source} (choix : {', '.join(llm_sources)})")
+            _clients[source] = llm_sources[source](cache=get_response_cache())
+        return _clients[source]
+
+
+def reset_llm_clients():
+    """Libère les clients et le cache (ex. entre deux tests)."""
+    global _cache
+    with _registry_lock:
+        _clients.clear()
+        if _cache is not None:
+            _cache.close()
+            _cache = None
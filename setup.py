@@ -3,7 +3,7 @@ from setuptools import setup
 setup(
     name='etl_oms',
     version='0.1.0',
-    py_modules=['ETL_OMS_OPERATIONNEL'],
+    py_modules=['ETL_OMS_OPERATIONNEL', 'etl_manifest', 'etl_mapping', 'etl_staging', 'db_session', 'etl_report', 'etl_output'],
     install_requires=[
         'pandas',
         'psycopg2',
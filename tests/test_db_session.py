@@ -0,0 +1,51 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+
+from psycopg2 import extensions
+
+import db_session
+
+
+class FakeConnection:
+    def __init__(self, **params):
+        self.params = params
+        self.closed = 0
+        self.info = SimpleNamespace(transaction_status=extensions.TRANSACTION_STATUS_IDLE)
+
+    def close(self):
+        self.closed = 1
+
+    def rollback(self):
+        self.info.transaction_status = extensions.TRANSACTION_STATUS_IDLE
+
+
+def test_connection_params_from_env_ne_garde_que_les_variables_definies():
+    environ = {"ETL_DB_HOST": "db.local", "ETL_DB_PORT": "5433", "ETL_DB_PASSWORD": ""}
+
+    assert db_session.connection_params_from_env(environ) == {"host": "db.local", "port": "5433"}
+
+
+def test_session_pool_reutilise_les_connexions_et_attend_quand_plein(monkeypatch):
+    opened = []
+    monkeypatch.setattr(psycopg2, "connect", lambda **kw: opened.append(FakeConnection(**kw)) or opened[-1])
+    pool = db_session.SessionPool({"host": "db.local"}, maxconn=1)
+
+    with pool.connection() as conn:
+        conn.info.transaction_status = extensions.TRANSACTION_STATUS_INTRANS
+        released = threading.Event()
+        waiter = threading.Thread(target=lambda: pool.connection().__enter__() and released.set())
+        waiter.start()
+        waiter.join(0.05)
+        assert waiter.is_alive()
+    waiter.join(1)
+
+    assert released.is_set()
+    assert len(opened) == 1 and opened[0].params == {"host": "db.local"}
+    assert opened[0].info.transaction_status == extensions.TRANSACTION_STATUS_IDLE
+    stats = pool.stats()
+    assert (stats["checkouts"], stats["hits"], stats["misses"]) == (2, 1, 1)
+    assert stats["max_wait_seconds"] > 0
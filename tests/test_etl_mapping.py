@@ -0,0 +1,16 @@
+from etl_mapping import ColumnMapper
+
+
+def test_column_mapper_respecte_l_ordre_des_synonymes_et_met_en_cache():
+    mapper = ColumnMapper({
+        "country": ["country", "location", "Country/Region"],
+        "date": ["date", "report_date"],
+    })
+    header = ["Report Date", "Country/Region", "location", "iso_code"]
+
+    result = mapper.resolve(header)
+
+    assert result.mapping == {"location": "country", "Report Date": "date"}
+    assert result.unmatched == ["Country/Region", "iso_code"]
+    assert mapper.resolve(list(header)) is result
+    assert mapper.stats() == {"signatures": 1, "hits": 1, "misses": 1}
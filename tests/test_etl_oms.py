@@ -0,0 +1,28 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+import ETL_OMS
+
+
+def test_to_visual_reproduit_le_pivot_first_sans_agregation():
+    df = pd.DataFrame({
+        "country": ["France", "France", "Italie"],
+        "Date": ["2020-01-01", "2020-01-01", "2020-01-02"],
+        "total_cases": [10, 12, 5],
+        "total_deaths": [1, 2, None],
+    })
+    df_long = ETL_OMS.transform(df, "COVID-19")
+
+    visual = ETL_OMS.to_visual(df_long)
+
+    assert df_long["indicator"].dtype == "category"
+    assert df_long["unit"].dtype == "category"
+    assert set(df_long["unit"]) == {"cases", "deaths"}
+    expected_units = df_long["indicator"].astype(str).map(ETL_OMS.unit_by_indicator)
+    assert df_long["unit"].astype(str).tolist() == expected_units.tolist()
+    expected = df_long.assign(indicator=df_long["indicator"].astype(str)).pivot_table(
+        index=ETL_OMS.visual_keys, columns="indicator", values="value", aggfunc="first"
+    ).reset_index().fillna(0)
+    expected.columns.name = None
+    pd.testing.assert_frame_equal(visual, expected, check_dtype=False)
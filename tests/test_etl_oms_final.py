@@ -0,0 +1,111 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+import ETL_OMS_FINAL
+
+
+def write_feed(path, countries, dates):
+    pd.DataFrame({
+        "location": [c for c in countries for _ in dates],
+        "date": list(dates) * len(countries),
+        "total_cases": range(len(countries) * len(dates)),
+        "total_deaths": 0,
+    }).to_csv(path, index=False)
+
+
+def test_run_batch_cles_globales_et_partitions_en_ajout(tmp_path, monkeypatch):
+    feeds = tmp_path / "feeds"
+    feeds.mkdir()
+    write_feed(feeds / "covid_a.csv", ["France", "Italie"], ["2020-12-31", "2021-01-01"])
+    write_feed(feeds / "covid_b.csv", ["Italie", "Japon"], ["2021-01-02"])
+    write_feed(feeds / "mpox_report.csv", ["Japon"], ["2022-05-01"])
+    (feeds / "population.csv").write_text("country,population\nFrance,1\n")
+    monkeypatch.setattr(ETL_OMS_FINAL, "result_folder", str(tmp_path / "out"))
+
+    for _ in range(2):  # un second run réécrit ses partitions au lieu de dupliquer
+        keys = ETL_OMS_FINAL.run_batch(str(feeds))
+
+    assert keys.ids["pays"] == {"France": 1, "Italie": 2, "Japon": 3}
+    assert keys.ids["maladie"] == {"COVID-19": 1, "Monkeypox": 2}
+
+    covid_2021 = tmp_path / "out" / "Statistique" / "COVID-19" / "2021"
+    assert sorted(p.name for p in covid_2021.iterdir()) == ["covid_a.csv", "covid_a.ndjson", "covid_b.csv", "covid_b.ndjson"]
+    stats = ETL_OMS_FINAL.read_partition(str(covid_2021))
+    assert stats["id_region"].tolist() == [1, 2, 2, 3]
+    assert len(ETL_OMS_FINAL.read_partition(str(covid_2021), "ndjson")) == 4
+
+    mpox = ETL_OMS_FINAL.read_partition(str(tmp_path / "out" / "Statistique" / "Monkeypox" / "2022"))
+    assert mpox[["id_maladie", "id_region"]].values.tolist() == [[2, 3]]
+    assert len(pd.read_csv(tmp_path / "out" / "Pays.csv")) == 3
+
+
+def test_run_batch_successifs_conservent_les_lignes_des_autres_sources(tmp_path, monkeypatch):
+    monkeypatch.setattr(ETL_OMS_FINAL, "result_folder", str(tmp_path / "out"))
+    for folder in ("a", "c"):
+        (tmp_path / folder).mkdir()
+    write_feed(tmp_path / "a" / "covid_a.csv", ["France"], ["2021-01-01", "2022-01-01"])
+    write_feed(tmp_path / "c" / "covid_c.csv", ["Italie"], ["2021-01-01"])
+    partition = str(tmp_path / "out" / "Statistique" / "COVID-19" / "2021")
+
+    ETL_OMS_FINAL.run_batch(str(tmp_path / "a"))
+    ETL_OMS_FINAL.run_batch(str(tmp_path / "c"))
+    assert sorted(ETL_OMS_FINAL.read_partition(partition)["id_region"]) == [1, 2]
+    assert len(pd.read_csv(tmp_path / "out" / "Pays.csv")) == 2
+
+    # Une source retraitée ne remplace que ses propres lignes, toutes années comprises
+    write_feed(tmp_path / "a" / "covid_a.csv", ["France"], ["2021-01-02"])
+    ETL_OMS_FINAL.run_batch(str(tmp_path / "a"))
+    stats = ETL_OMS_FINAL.read_partition(partition)
+    assert sorted(zip(stats["id_region"], stats["date"])) == [(1, "2021-01-02"), (2, "2021-01-01")]
+    assert ETL_OMS_FINAL.read_partition(str(tmp_path / "out" / "Statistique" / "COVID-19" / "2022")).empty
+
+
+def test_clear_source_ne_supprime_pas_une_source_prefixee(tmp_path):
+    writer = ETL_OMS_FINAL.PartitionWriter(str(tmp_path), formats=("csv", "json"))
+    stats = pd.DataFrame({"id_region": [1], "date": pd.to_datetime(["2021-01-01"])})
+    writer.write(stats, "COVID-19", "a")
+    writer.write(stats, "COVID-19", "a.b")
+
+    ETL_OMS_FINAL.PartitionWriter(str(tmp_path), formats=("csv", "json")).clear_source("COVID-19", "a")
+
+    partition = tmp_path / "Statistique" / "COVID-19" / "2021"
+    assert sorted(p.name for p in partition.iterdir()) == ["a.b.csv", "a.b.ndjson"]
+
+
+def test_partitions_suivent_formats_et_compression(tmp_path, monkeypatch):
+    monkeypatch.setattr(ETL_OMS_FINAL, "result_folder", str(tmp_path / "out"))
+    monkeypatch.setattr(ETL_OMS_FINAL, "table_formats", ("json",))
+    monkeypatch.setattr(ETL_OMS_FINAL, "table_compression", "gzip")
+    (tmp_path / "feeds").mkdir()
+    write_feed(tmp_path / "feeds" / "covid_a.csv", ["France", "Italie"], ["2021-01-01"])
+
+    ETL_OMS_FINAL.run_batch(str(tmp_path / "feeds"))
+
+    partition = tmp_path / "out" / "Statistique" / "COVID-19" / "2021"
+    assert [p.name for p in partition.iterdir()] == ["covid_a.ndjson.gz"]
+    assert len(ETL_OMS_FINAL.read_partition(str(partition), "ndjson")) == 2
+    assert (tmp_path / "out" / "Pays.json.gz").exists()
+
+
+def test_keymap_persiste_les_cles_entre_runs(tmp_path):
+    df = pd.DataFrame({
+        "country": ["Italie", "France", "Italie", None],
+        "date": pd.to_datetime(["2020-01-01"] * 4),
+        "new_deaths": 0, "new_cases": 1, "deaths": 2,
+    })
+    path = tmp_path / "keymap.json"
+    keys = ETL_OMS_FINAL.KeyRegistry()
+    ETL_OMS_FINAL.create_tables(df, "COVID-19", keys)
+    keys.save(str(path))
+
+    reloaded = ETL_OMS_FINAL.KeyRegistry.load(str(path))
+    countries, regions, maladie, stats = ETL_OMS_FINAL.create_tables(
+        df.iloc[::-1].assign(country=["Japon", "Italie", "France", "Japon"]), "Monkeypox", reloaded
+    )
+
+    assert countries.values.tolist() == [["Japon", 3], ["Italie", 1], ["France", 2]]
+    assert regions["id_region"].tolist() == regions["id_pays"].tolist() == [3, 1, 2]
+    assert maladie.values.tolist() == [[2, "Monkeypox"]]
+    assert stats["id_region"].tolist() == [3, 1, 2, 3]
+    assert (stats["id_maladie"] == 2).all()
@@ -0,0 +1,520 @@
+import os
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("psycopg2")
+
+import ETL_OMS_OPERATIONNEL as etl
+
+
+def test_build_rows_mappe_les_regions_et_remplit_les_manquants():
+    df = pd.DataFrame({
+        "country": ["France", "Inconnu", "France"],
+        "date": pd.to_datetime(["2020-01-01", "2020-01-01", "2020-01-02"]),
+        "confirmed": [10, 5, None],
+        "deaths": [1, 0, 2],
+        "new_cases": [10, 5, pd.NA],
+        "new_deaths": [1.0, None, 1.0],
+    })
+
+    rows = etl.build_rows(df, 3, {"France": 7})
+
+    assert rows["id_region"].tolist() == [7, 7]
+    assert rows["id_maladie"].tolist() == [3, 3]
+    assert rows["nouveau_cas"].tolist() == [10, 0]
+    assert rows["total_cas"].tolist() == [10, 0]
+    assert rows["nouveau_mort"].dtype == "int64"
+
+
+def test_chunk_stream_relit_le_flux_par_petites_lectures():
+    stream = etl.ChunkStream([b"abc", b"", b"defgh", b"i"])
+
+    parts = []
+    while True:
+        data = stream.read(4)
+        if not data:
+            break
+        parts.append(data)
+
+    assert parts == [b"abcd", b"efgh", b"i"]
+
+
+def test_iter_binary_chunks_encode_au_format_pgcopy():
+    import struct
+
+    df = pd.DataFrame({
+        "id_region": [5], "date": pd.to_datetime(["2000-01-03"]), "id_maladie": [2],
+        "nouveau_mort": [1], "nouveau_cas": [-4], "total_mort": [7], "total_cas": [9],
+    })
+
+    data = b"".join(etl.iter_binary_chunks(df))
+
+    assert data.startswith(b"PGCOPY\n\xff\r\n\x00")
+    assert data.endswith(struct.pack("!h", -1))
+    tuple_bytes = data[len(etl.PGCOPY_HEADER):-2]
+    values = struct.unpack("!h" + "ii" * 7, tuple_bytes)
+    assert values[0] == 7
+    assert values[2::2] == (5, 2, 2, 1, -4, 7, 9)
+
+
+def test_incremental_rows_ne_recharge_que_les_cles_modifiees(tmp_path):
+    from etl_manifest import Manifest
+
+    def rows(region, day, cas):
+        return pd.DataFrame({
+            "id_region": [region], "date": pd.to_datetime([day]), "id_maladie": [1],
+            "nouveau_mort": [0], "nouveau_cas": [cas], "total_mort": [0], "total_cas": [cas],
+        })[etl.temp_statistique_columns]
+
+    file_a, file_b = tmp_path / "a.csv", tmp_path / "b.csv"
+    file_a.write_text("a")
+    file_b.write_text("b")
+    manifest = Manifest(str(tmp_path / "manifest.sqlite"))
+    manifest.record(str(file_a), pd.concat([rows(1, "2020-01-01", 5), rows(2, "2020-01-01", 3)]))
+    manifest.record(str(file_b), rows(1, "2020-01-01", 10))
+    manifest.commit()
+
+    file_a.write_text("a modifié")
+    assert manifest.is_unchanged(str(file_b))
+    assert not manifest.is_unchanged(str(file_a))
+
+    new_a = pd.concat([rows(1, "2020-01-01", 6), rows(2, "2020-01-01", 3)])
+    result = etl.incremental_rows(manifest, [(str(file_a), new_a)])
+
+    assert result["id_region"].tolist() == [1]
+    assert result["nouveau_cas"].tolist() == [16]
+    assert result["total_cas"].tolist() == [10]
+
+
+def test_rates_to_absolute_joint_la_population_par_pays():
+    df = pd.DataFrame({
+        "country": ["France", "Italie", "France"],
+        "confirmed": [None, None, 42.0],
+        "deaths": [None, None, None],
+        "total_cases_per_million": [2.0, 3.0, 5.0],
+        "new_cases_per_million": [9.0, 9.0, 9.0],
+        "total_deaths_per_million": [1.0, 1.0, 1.0],
+    })
+    population = pd.Series({"France": 1_000_000, "Italie": 2_000_000})
+
+    df = etl.rates_to_absolute(df, population)
+
+    assert df["confirmed"].tolist() == [2.0, 6.0, 42.0]
+    assert df["deaths"].tolist() == [1.0, 2.0, 1.0]
+
+
+def test_load_population_accepte_un_pays_repete(tmp_path, monkeypatch):
+    pd.DataFrame({
+        "Country/Region": ["France", "France", "Italie"],
+        "Province/State": ["", "Martinique", ""],
+        "Population": [None, 65_000_000, 60_000_000],
+    }).to_csv(tmp_path / "covid_global.csv", index=False)
+    pd.DataFrame({
+        "Country/Region": ["Italie", "Japon", "Japon"],
+        "Population": [1, 125_000_000, 1],
+    }).to_csv(tmp_path / "covid_worldometer_data.csv", index=False)
+    monkeypatch.setattr(etl, "datasets_folder", str(tmp_path))
+
+    population = etl.load_population()
+
+    assert population.to_dict() == {"France": 65_000_000, "Italie": 60_000_000, "Japon": 125_000_000}
+
+
+def test_parse_dates_detecte_le_format_une_fois_et_traite_les_restes():
+    etl.date_format_cache.clear()
+    values = pd.Series(["1/22/20", "1/23/20", None, "2020-02-01", "n/a"])
+
+    parsed = etl.parse_dates(values, ("Date",))
+
+    assert etl.date_format_cache == {("Date",): "%m/%d/%y"}
+    assert parsed.tolist()[:2] == [pd.Timestamp("2020-01-22"), pd.Timestamp("2020-01-23")]
+    assert parsed.iloc[3] == pd.Timestamp("2020-02-01")
+    assert parsed.iloc[[2, 4]].isna().all()
+
+
+def test_stat_accumulator_replie_les_lots_comme_un_groupby_global():
+    def rows(maladie, regions, cas):
+        return pd.DataFrame({
+            "id_region": regions, "date": pd.to_datetime(["2020-01-01"] * len(regions)),
+            "id_maladie": [maladie] * len(regions), "nouveau_mort": [1] * len(regions),
+            "nouveau_cas": cas, "total_mort": [1] * len(regions), "total_cas": cas,
+        })[etl.temp_statistique_columns]
+
+    lots = [rows(1, [1, 1, 2], [3, 4, 5]), rows(2, [2, 3], [7, 1]), rows(3, [], [])]
+    accumulator = etl.StatAccumulator()
+    for lot in lots:
+        accumulator.add(lot)
+
+    expected = etl.aggregate_rows(pd.concat(lots[:2], ignore_index=True))
+    pd.testing.assert_frame_equal(accumulator.result().reset_index(drop=True), expected.reset_index(drop=True))
+    assert accumulator.nb_input_rows == 5
+    assert accumulator.result()["id_maladie"].tolist() == [1, 1, 2]
+
+
+def test_stat_accumulator_equivaut_a_aggregate_rows_sur_des_lots_aleatoires():
+    np = pytest.importorskip("numpy")
+    rng = np.random.default_rng(0)
+    lots = [
+        pd.DataFrame({
+            "id_region": rng.integers(1, 20, n),
+            "date": pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 10, n), "D"),
+            "id_maladie": i + 1,
+            "nouveau_mort": rng.integers(0, 5, n), "nouveau_cas": rng.integers(0, 50, n),
+            "total_mort": rng.integers(0, 100, n), "total_cas": rng.integers(0, 1000, n),
+        })[etl.temp_statistique_columns]
+        for i, n in enumerate((50, 120, 80, 30))
+    ]
+    accumulator = etl.StatAccumulator()
+    for lot in lots:
+        accumulator.add(lot)
+
+    expected = etl.aggregate_rows(pd.concat(lots, ignore_index=True))
+    pd.testing.assert_frame_equal(accumulator.result(), expected.reset_index(drop=True))
+
+
+def test_file_sink_attribue_les_cles_et_ecrit_une_partition_par_maladie(tmp_path):
+    sink = etl.FileSink(str(tmp_path))
+    with sink:
+        maladies = sink.resolve("maladie", "id_maladie", ["nom_maladie"], [("COVID-19",), ("Ebola",)])
+        pays = sink.resolve("pays", "id_pays", ["nom_pays"], [("France",), ("Italie",)])
+        regions = sink.resolve("region", "id_region", ["nom_region", "id_pays"],
+                               [("France", pays["France"]), ("Italie", pays["Italie"])])
+        assert sink.resolve("pays", "id_pays", ["nom_pays"], [("Italie",), ("Spain",)]) == {"Italie": 2, "Spain": 3}
+        assert sink.update_coordinates({regions["France"]: (46.2, 2.2)}) == 1
+        sink.load(pd.DataFrame({
+            "id_region": [regions["France"], regions["Italie"]], "date": pd.to_datetime(["2020-01-01"] * 2),
+            "id_maladie": [maladies["COVID-19"]] * 2, "nouveau_mort": [0, 1], "nouveau_cas": [2, 3],
+            "total_mort": [0, 1], "total_cas": [2, 3],
+        })[etl.temp_statistique_columns])
+        sink.commit()
+
+    assert sink.dimensions()[2] == {"France": 1, "Italie": 2}
+    region = pd.read_csv(tmp_path / "COVID-19" / "Region.csv")
+    assert region["latitude"].tolist()[0] == 46.2
+    assert len(pd.read_csv(tmp_path / "COVID-19" / "Statistique.csv")) == 2
+    assert pd.read_csv(tmp_path / "COVID-19" / "Pays.csv")["nom_pays"].tolist() == ["France", "Italie"]
+    assert pd.read_csv(tmp_path / "Ebola" / "Statistique.csv").empty
+
+
+def test_file_sink_ecrit_par_etl_output_hors_des_resultats_versionnes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    sink = etl.FileSink(file_format="ndjson")
+    sink.resolve("maladie", "id_maladie", ["nom_maladie"], [("COVID-19",)])
+    sink.commit()
+
+    assert os.path.abspath(sink.folder) == str(tmp_path / ".etl_output")
+    assert pd.read_json(tmp_path / ".etl_output" / "COVID-19" / "Maladie.ndjson", lines=True)["nom_maladie"].tolist() == [
+        "COVID-19"
+    ]
+    assert not (tmp_path / "Résultat de l'ETL").exists()
+
+
+def test_transform_chunks_ne_depend_pas_de_la_taille_des_blocs(tmp_path):
+    path = tmp_path / "mpox_report.csv"
+    pd.DataFrame({
+        "location": ["France"] * 4,
+        "date": ["2022-05-01", "2022-05-02", "2022-05-03", "2022-05-04"],
+        "total_cases": [1, 5, 9, 20],
+        "new_cases": [1, 4, 0, 0],
+    }).to_csv(path, index=False)
+
+    whole = etl.transform(pd.read_csv(path))
+    chunked = etl.transform_chunks(str(path), None, chunksize=2)
+
+    assert whole["new_cases"].tolist() == [1, 4, 0, 0]
+    assert chunked["new_cases"].tolist() == [1, 4, 0, 0]
+
+
+def test_transform_chunks_reprend_le_cumul_du_bloc_precedent(tmp_path):
+    path = tmp_path / "covid_global.csv"
+    pd.DataFrame({
+        "Country/Region": ["France", "Italie", "France", "Italie", "France", "Italie"],
+        "Date": ["1/22/20", "1/22/20", "1/23/20", "1/23/20", "1/24/20", "1/24/20"],
+        "Confirmed": [2, 10, 5, 10, 9, 13],
+        "Deaths": [0, 1, 1, 1, 1, 3],
+    }).to_csv(path, index=False)
+
+    whole = etl.transform(pd.read_csv(path))
+    for chunksize in (1, 2, 3):
+        chunked = etl.transform_chunks(str(path), None, chunksize=chunksize)
+        assert chunked["new_cases"].tolist() == [0, 0, 3, 0, 4, 3]
+        assert chunked["new_deaths"].tolist() == [0, 0, 1, 0, 0, 2]
+        assert chunked["new_cases"].tolist() == whole["new_cases"].tolist()
+
+
+class FakeCursor:
+    """Curseur psycopg2 minimal : journalise SQL et données COPY dans sa connexion."""
+
+    def __init__(self, conn):
+        self.connection = conn
+        self.rowcount = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        sql = sql.decode() if isinstance(sql, bytes) else sql
+        self.connection.statement(sql, params)
+        self.rowcount = self.connection.rowcount
+
+    def copy_expert(self, sql, stream):
+        self.connection.statement(sql, stream.read())
+
+    def mogrify(self, template, args):
+        return (template.decode() % tuple(repr(a) for a in args)).encode()
+
+    def fetchall(self):
+        return self.connection.results.pop(0) if self.connection.results else []
+
+
+class FakeConnection:
+    """Connexion factice : `fail_on` contient des fragments de SQL ou des noms de
+    méthodes (commit, tpc_prepare...) qui lèvent une erreur."""
+
+    encoding = "UTF8"
+
+    def __init__(self, fail_on=(), results=None, rowcount=0):
+        self.fail_on = set(fail_on)
+        self.results = list(results or [])
+        self.rowcount = rowcount
+        self.log = []
+
+    def statement(self, sql, params=None):
+        self.log.append((sql, params))
+        if any(fragment in sql for fragment in self.fail_on):
+            raise RuntimeError(f"{sql.split()[0]} en échec")
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def xid(self, *args):
+        return args
+
+    def __getattr__(self, name):
+        def call(*args):
+            self.log.append((name, args))
+            if name in self.fail_on:
+                raise RuntimeError(f"{name} en échec")
+        return call
+
+    @property
+    def sql(self):
+        return [s for s, _ in self.log if s not in ("commit", "rollback") and not s.startswith("tpc_")]
+
+    def committed(self):
+        """Instructions SQL effectivement commitées."""
+        committed, pending = [], []
+        for sql, _ in self.log:
+            if sql in ("commit", "tpc_commit"):
+                committed += pending
+                pending = []
+            elif sql in ("rollback", "tpc_rollback"):
+                pending = []
+            else:
+                pending.append(sql)
+        return committed
+
+
+class FakePool:
+    def __init__(self, conns):
+        self.conns = iter(conns)
+
+    def connection(self):
+        from contextlib import nullcontext
+        return nullcontext(next(self.conns))
+
+
+def shard_frame():
+    return pd.DataFrame({
+        "id_region": range(1, 13), "date": pd.Timestamp("2020-01-01"), "id_maladie": 1,
+        "nouveau_mort": 0, "nouveau_cas": 1, "total_mort": 0, "total_cas": 1,
+    })[etl.temp_statistique_columns]
+
+
+def merges(conns):
+    return [sql for conn in conns for sql in conn.committed() if "INSERT INTO statistique" in sql]
+
+
+def test_parallel_copy_fusionne_les_paquets_en_une_seule_transaction():
+    conns = [FakeConnection(), FakeConnection(), FakeConnection()]
+
+    etl.parallel_copy_into_statistique(shard_frame(), 3, pool=FakePool(conns))
+
+    (merge,) = merges(conns)
+    assert merge in conns[0].committed()
+    assert merge.count("UNION ALL") == 2 and merge.count("FROM staging_statistique_etl_oms_") == 3
+    copies = [sql for conn in conns for sql in conn.sql if sql.strip().startswith("COPY")]
+    assert len(copies) == 3
+    assert any(sql.startswith("DROP TABLE staging_statistique_") for sql in conns[0].committed())
+
+
+@pytest.mark.parametrize("failing", ["copy", "merge"])
+def test_parallel_copy_echec_ne_commite_rien_dans_statistique(failing):
+    conns = [FakeConnection(), FakeConnection(), FakeConnection()]
+    if failing == "copy":
+        conns[1].fail_on.add("COPY")
+    else:
+        conns[0].fail_on.add("INSERT INTO statistique")
+
+    with pytest.raises(RuntimeError):
+        etl.parallel_copy_into_statistique(shard_frame(), 3, pool=FakePool(conns))
+
+    assert merges(conns) == []
+    drops = [sql for sql in conns[0].committed() if sql.startswith("DROP TABLE IF EXISTS staging_statistique_")]
+    assert len(drops) == 1 and drops[0].count("staging_statistique_") == 3
+
+
+def test_parallel_copy_two_phase_annule_chaque_connexion_meme_si_l_une_echoue(monkeypatch):
+    monkeypatch.setattr(etl, "load_shard", lambda *args: None)
+    conns = [FakeConnection(), FakeConnection({"tpc_prepare", "tpc_rollback"}), FakeConnection()]
+
+    with pytest.raises(RuntimeError, match="tpc_prepare"):
+        etl.parallel_copy_into_statistique(shard_frame(), 3, two_phase=True, pool=FakePool(conns))
+
+    assert [c.log[-1][0] for c in conns] == ["tpc_rollback"] * 3
+
+
+def write_owid_csv(path, deaths=("0", "1", "3")):
+    pd.DataFrame({
+        "location": ["France", "France", "Italie"],
+        "iso_code": ["FRA", "FRA", "ITA"],
+        "date": ["2020-03-01", "2020-03-02", "2020-03-01"],
+        "total_cases": [1, 4, 2],
+        "total_deaths": list(deaths),
+        "total_cases_per_million": [0.5, 1.25, 0.75],
+        "stringency_index": [10, 20, 30],
+    }).to_csv(path, index=False)
+    return str(path)
+
+
+def test_read_csv_pruned_ne_lit_que_les_colonnes_utiles(tmp_path):
+    path = write_owid_csv(tmp_path / "owid.csv")
+
+    pruned = etl.read_csv_pruned(path)
+    plain = pd.read_csv(path)
+
+    assert pruned.columns.tolist() == ["location", "date", "total_cases", "total_deaths", "total_cases_per_million"]
+    assert pruned["location"].dtype == "category"
+    assert pruned["total_deaths"].dtype == "float64"
+    assert pruned["total_cases_per_million"].dtype == "float32"
+    # pyarrow lit les dates ISO en datetime.date : comparaison après conversion
+    pruned["date"] = pd.to_datetime(pruned["date"])
+    expected = plain[pruned.columns].astype({"location": "category"}).assign(date=pd.to_datetime(plain["date"]))
+    pd.testing.assert_frame_equal(pruned, expected, check_dtype=False)
+
+
+def test_read_csv_pruned_convertit_un_compteur_texte(tmp_path):
+    path = write_owid_csv(tmp_path / "owid.csv", deaths=("0", "inconnu", "3"))
+
+    pruned = etl.read_csv_pruned(path)
+
+    assert pruned["total_deaths"].dtype == "float64"
+    assert pruned["total_deaths"].isna().tolist() == [False, True, False]
+    assert pruned["total_cases"].tolist() == pd.read_csv(path)["total_cases"].tolist()
+
+
+def test_read_csv_pruned_par_blocs_n_impose_que_les_categories(tmp_path):
+    path = write_owid_csv(tmp_path / "owid.csv", deaths=("0", "inconnu", "3"))
+
+    with etl.read_csv_pruned(path, chunksize=2) as reader:
+        chunks = list(reader)
+
+    assert [len(c) for c in chunks] == [2, 1]
+    assert all(c["location"].dtype == "category" for c in chunks)
+    assert pd.concat(chunks)["total_deaths"].astype(str).tolist() == ["0", "inconnu", "3"]
+    assert "iso_code" not in chunks[0].columns
+
+
+@pytest.mark.parametrize("arrow", [True, False])
+def test_read_csv_pruned_choisit_le_moteur(tmp_path, monkeypatch, arrow):
+    path = write_owid_csv(tmp_path / "owid.csv")
+    engines = []
+    read_csv = pd.read_csv
+
+    def spy(*args, **kwargs):
+        engines.append(kwargs.get("engine"))
+        if kwargs.get("engine") == "pyarrow" and not etl.pyarrow_available:
+            kwargs.pop("engine")
+        return read_csv(*args, **kwargs)
+
+    monkeypatch.setattr(etl, "pyarrow_available", arrow)
+    monkeypatch.setattr(etl.pd, "read_csv", spy)
+
+    df = etl.read_csv_pruned(path)
+    etl.read_csv_pruned(path, chunksize=2).close()
+
+    assert engines[1] == ("pyarrow" if arrow else None)  # [0] : lecture de l'en-tête
+    assert engines[3] is None  # lecture par blocs : moteur C
+    assert len(df) == 3
+
+
+def test_payload_aller_retour_conserve_valeurs_et_dtypes():
+    np = pytest.importorskip("numpy")
+    df = pd.DataFrame({
+        "country": pd.Categorical(["France", None, "Italie", "France"]),
+        "date": pd.to_datetime(["2020-01-01", "2020-01-02", None, "2020-01-04"]).astype("datetime64[s]"),
+        "confirmed": [1.0, np.nan, 3.0, 4.0],
+        "deaths": [0.0, 1.0, np.nan, 2.0],
+        "new_cases": np.array([1, 0, 2, 1], dtype="int64"),
+        "new_deaths": [0.0, 0.0, 1.0, np.nan],
+        "latitude": [46.2, np.nan, 41.9, 46.2],
+        "longitude": [2.2, np.nan, 12.6, 2.2],
+    }, index=[3, 5, 8, 9])
+
+    for frame in (df, df.astype({"country": "object"})):
+        restored = etl.payload_to_frame(etl.frame_to_payload(frame))
+        pd.testing.assert_frame_equal(restored, frame)
+
+
+def test_load_frames_en_parallele_identique_au_sequentiel():
+    files = list(etl.iter_dataset_files())
+    if len(files) < 2:
+        pytest.skip("DATASETS absent")
+    population = etl.load_population()
+
+    serial, serial_ignored = etl.load_frames(population, workers=1, files=files)
+    parallel, parallel_ignored = etl.load_frames(population, workers=2, files=files)
+
+    assert parallel_ignored == serial_ignored
+    assert [(fn, mal) for fn, mal, _ in parallel] == [(fn, mal) for fn, mal, _ in serial]
+    for (_, _, expected), (_, _, df) in zip(serial, parallel):
+        pd.testing.assert_frame_equal(df, expected)
+
+
+def test_upsert_dimension_insere_les_nouveaux_et_relit_les_existants():
+    # France existe déjà (id 1) ; Italie est insérée (id 2) ; Spain, insérée
+    # par une autre transaction pendant la requête, est relue ensuite
+    conn = FakeConnection(results=[[(2, "Italie"), (1, "France")], [(3, "Spain")]])
+
+    ids = etl.upsert_dimension(conn.cursor(), "pays", "id_pays", ["nom_pays"],
+                               [("France",), ("Italie",), ("Spain",)])
+
+    assert ids == {"France": 1, "Italie": 2, "Spain": 3}
+    (upsert, _), (reselect, params) = conn.log
+    query = " ".join(upsert.split())
+    assert "WITH input(nom_pays) AS (VALUES ('France'),('Italie'),('Spain'))" in query
+    assert "INSERT INTO pays(nom_pays) SELECT nom_pays FROM input" in query
+    assert "ON CONFLICT (nom_pays) DO NOTHING RETURNING id_pays, nom_pays" in query
+    assert "SELECT id_pays, nom_pays FROM ins UNION ALL SELECT t.id_pays, t.nom_pays FROM pays t" in query
+    assert "WHERE nom_pays = ANY(%s)" in reselect and params == (["Spain"],)
+    assert etl.upsert_dimension(conn.cursor(), "pays", "id_pays", ["nom_pays"], []) == {}
+    assert len(conn.log) == 2
+
+
+def test_update_region_coordinates_passe_par_une_table_temporaire():
+    conn = FakeConnection(rowcount=2)
+
+    assert etl.update_region_coordinates(conn.cursor(), {7: (46.2, 2.2), 9: ("41.9", 12.5)}) == 2
+    ddl, insert, update = (" ".join(sql.split()) for sql in conn.sql)
+    assert "CREATE TEMP TABLE region_coords ( id_region INTEGER PRIMARY KEY" in ddl and ddl.endswith("ON COMMIT DROP;")
+    assert insert == "INSERT INTO region_coords(id_region, latitude, longitude) VALUES (7,46.2,2.2),(9,41.9,12.5)"
+    assert "UPDATE region r SET latitude = c.latitude, longitude = c.longitude FROM region_coords c" in update
+    assert "(r.latitude IS NULL OR r.longitude IS NULL)" in update
+
+    conn = FakeConnection(rowcount=5)
+    assert etl.update_region_coordinates(conn.cursor(), {}) == 0
+    assert conn.log == []
@@ -0,0 +1,68 @@
+import gzip
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+import etl_output
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({
+        "id_region": range(5),
+        "date": pd.date_range("2020-01-01", periods=5),
+        "nouveau_cas": [1.0, None, 3.0, 4.0, 5.0],
+        "pays": ["France", "Côte d'Ivoire", "Italie", "Japon", "Pérou"],
+    })
+
+
+def test_json_par_blocs_identique_a_to_json(df, tmp_path):
+    paths = etl_output.write_table(df, str(tmp_path / "Statistique"), ("csv", "json", "ndjson"), chunksize=2)
+
+    assert [p.rsplit(".", 1)[1] for p in paths] == ["csv", "json", "ndjson"]
+    with open(paths[1], encoding="utf-8") as f:
+        assert f.read() == df.to_json(orient="records", date_format="iso")
+    pd.testing.assert_frame_equal(pd.read_csv(paths[0], parse_dates=["date"]), df)
+    ndjson = pd.read_json(paths[2], lines=True, convert_dates=["date"])
+    assert ndjson["pays"].tolist() == df["pays"].tolist()
+    assert len(ndjson) == len(df)
+
+
+def test_compression_gzip_et_table_vide(df, tmp_path):
+    (path,) = etl_output.write_table(df, str(tmp_path / "t"), ("ndjson",), "gzip", chunksize=3)
+    assert path.endswith(".ndjson.gz")
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        assert len(f.read().splitlines()) == len(df)
+
+    (path,) = etl_output.write_table(df.iloc[:0], str(tmp_path / "vide"), ("json",))
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == "[]"
+
+
+def test_parse_formats():
+    assert etl_output.parse_formats("CSV, ndjson") == ("csv", "ndjson")
+    with pytest.raises(ValueError):
+        etl_output.parse_formats("csv,xml")
+
+
+def test_ajout_csv_et_ndjson_compresses(df, tmp_path):
+    base = str(tmp_path / "part")
+    etl_output.write_table(df.iloc[:2], base, ("csv", "ndjson"), "gzip")
+    paths = etl_output.write_table(df.iloc[2:], base, ("csv", "ndjson"), "gzip", append=True)
+
+    pd.testing.assert_frame_equal(pd.read_csv(paths[0], parse_dates=["date"]), df)
+    assert pd.read_json(paths[1], lines=True)["id_region"].tolist() == list(range(5))
+    assert etl_output.appendable(("csv", "json", "ndjson")) == ("csv", "ndjson")
+    with pytest.raises(ValueError):
+        etl_output.write_table(df, base, ("json",), append=True)
+
+
+def test_parquet_sans_suffixe_de_compression(df, tmp_path):
+    pytest.importorskip("pyarrow")
+    (path,) = etl_output.write_table(df, str(tmp_path / "t"), ("parquet",), "gzip", chunksize=2)
+
+    assert path.endswith("t.parquet")
+    pd.testing.assert_frame_equal(pd.read_parquet(path), df, check_dtype=False)
+    with pytest.raises(ValueError):
+        etl_output.write_table(df, str(tmp_path / "t"), ("parquet",), append=True)
@@ -0,0 +1,29 @@
+import json
+
+from etl_report import RunReport, activate, file_context, stage
+
+
+def test_run_report_agrege_par_fichier_et_etape(tmp_path):
+    with stage("extract") as st:
+        st["rows_out"] = 99  # aucun rapport actif : rien n'est enregistré
+
+    report = RunReport()
+    with activate(report):
+        for _ in range(2):
+            with file_context("a.csv"), stage("extract", bytes_read=10) as st:
+                st["rows_out"] = 5
+        with stage("copy", rows_in=7) as st:
+            st["rows_out"] = 7
+    report.merge([{"file": "b.csv", "stage": "extract", "calls": 1, "seconds": 0.5,
+                   "rows_in": None, "rows_out": 3, "bytes_read": 4, "peak_rss_mb": None}])
+    report.finish()
+    report.write_json(tmp_path / "report.json")
+
+    data = json.loads((tmp_path / "report.json").read_text(encoding="utf-8"))
+    stages = {(r["file"], r["stage"]): r for r in data["stages"]}
+    assert stages[("a.csv", "extract")]["calls"] == 2
+    assert stages[("a.csv", "extract")]["rows_out"] == 10
+    assert stages[("a.csv", "extract")]["bytes_read"] == 20
+    assert stages[(None, "copy")]["rows_in"] == 7
+    assert data["totals"]["extract"]["rows_out"] == 13
+    assert data["total_seconds"] is not None
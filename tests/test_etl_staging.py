@@ -0,0 +1,48 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+
+from etl_staging import StagingCache
+
+
+def test_staging_cache_reutilise_les_fichiers_inchanges(tmp_path):
+    source_a, source_b = tmp_path / "a.csv", tmp_path / "b.csv"
+    source_a.write_text("a")
+    source_b.write_text("b")
+    df = pd.DataFrame({
+        "country": pd.Categorical(["France", "Italie"]),
+        "date": pd.to_datetime(["2020-01-01", "2020-01-02"]),
+        "confirmed": [1.0, None],
+    })
+    cache = StagingCache(str(tmp_path / "staging"))
+    cache.put("a.csv", str(source_a), "COVID-19", df)
+    cache.put("b.csv", str(source_b), None, None)
+    cache.save()
+
+    source_b.write_text("b modifié")
+    cache = StagingCache(str(tmp_path / "staging"))
+    frames, ignored, to_process = cache.split([("a.csv", str(source_a)), ("b.csv", str(source_b))])
+
+    assert to_process == [("b.csv", str(source_b))]
+    assert ignored == []
+    (fn, maladie, cached), = frames
+    assert (fn, maladie) == ("a.csv", "COVID-19")
+    pd.testing.assert_frame_equal(cached, df)
+    assert cache.load_all()[1] == ["b.csv"]
+
+
+def test_staging_cache_supprime_l_ancien_fichier_arrow(tmp_path):
+    source = tmp_path / "a.csv"
+    source.write_text("a")
+    df = pd.DataFrame({"confirmed": [1.0, 2.0]})
+    staging = tmp_path / "staging"
+    cache = StagingCache(str(staging))
+    cache.put("a.csv", str(source), "COVID-19", df)
+    cache.save()
+
+    source.write_text("a modifié")
+    cache = StagingCache(str(staging))
+    cache.put("a.csv", str(source), "COVID-19", df * 2)
+
+    assert [p.name for p in staging.glob("*.arrow")] == [cache.index["a.csv"]["file"]]
@@ -0,0 +1,70 @@
+import threading
+
+import pytest
+
+import llm_client
+
+
+class FakeClient(llm_client.LLMClient):
+    name = "fake"
+    instances = 0
+
+    def __init__(self, cache=None, max_new_tokens=None):
+        super().__init__(cache, max_new_tokens)
+        FakeClient.instances += 1
+        self.batches = []
+
+    def generate(self, prompts, max_new_tokens):
+        self.batches.append(list(prompts))
+        return [f"{p}->{max_new_tokens}" for p in prompts]
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    FakeClient.instances = 0
+    monkeypatch.setattr(llm_client, "cache_path", str(tmp_path / "cache.sqlite"))
+    monkeypatch.setitem(llm_client.llm_sources, "fake", FakeClient)
+    llm_client.reset_llm_clients()
+    yield
+    llm_client.reset_llm_clients()
+
+
+def test_client_construit_une_seule_fois_par_source(registry):
+    threads = [threading.Thread(target=llm_client.get_llm_client, args=("fake",)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert llm_client.get_llm_client("fake") is llm_client.get_llm_client("fake")
+    assert FakeClient.instances == 1
+    with pytest.raises(ValueError):
+        llm_client.get_llm_client("inconnue")
+
+
+def test_ask_batch_ne_regenere_que_les_prompts_absents_du_cache(registry):
+    client = llm_client.get_llm_client("fake")
+
+    assert client.ask_batch(["a", "b", "a"], max_new_tokens=16) == ["a->16", "b->16", "a->16"]
+    assert client.ask("b", max_new_tokens=16) == "b->16"
+    assert client.ask_batch(["c", "a"], max_new_tokens=16) == ["c->16", "a->16"]
+    assert client.ask("a", max_new_tokens=32) == "a->32"  # autres paramètres, autre clé
+    assert client.batches == [["a", "b"], ["c"], ["a"]]
+
+    # Le cache survit au processus (nouveau client, même fichier)
+    llm_client.reset_llm_clients()
+    again = llm_client.get_llm_client("fake")
+    assert again.ask("c", max_new_tokens=16) == "c->16"
+    assert again.batches == []
+
+
+def test_cache_lru_evince_les_moins_recemment_lues(tmp_path):
+    cache = llm_client.ResponseCache(str(tmp_path / "lru.sqlite"), max_entries=2)
+    cache.put_many({"k1": "r1"})
+    cache.put_many({"k2": "r2"})
+    assert cache.get_many(["k1"]) == {"k1": "r1"}
+    cache.put_many({"k3": "r3"})
+
+    assert len(cache) == 2
+    assert cache.get_many(["k1", "k2", "k3"]) == {"k1": "r1", "k3": "r3"}
+    cache.close()